@@ -1,19 +1,37 @@
 import argparse
 from pathlib import Path
 import mesa
-from mesa_geo.visualization import MapModule
 import mesa_geo as mg
 from pyrosm import OSM
 from zorzim.model.demand_model import RandomValparaisoDemandModel  
-from zorzim.model.model import ZorZim
-from zorzim.visualization.server import agent_draw, clock_element, status_chart, trip_chart
+from zorzim.model.model import ZorZim, load_road_graph
+from zorzim.model.profiling import StepProfiler
+from zorzim.model.replications import MAX_STEPS, run_replications
+from zorzim.model.trajectory import TrajectoryRecorder
 from zorzim.agent.commuter import Commuter, MarkerAgent
+from zorzim.space.osm_extract import OSMExtract
+from zorzim.visualization.render import TILE_CACHE_PATH, RenderStage
+
+DATA_CRS = "epsg:4326"  # CRS de los datos de OpenStreetMap
 
 def make_parser():
     """Configura los argumentos de línea de comandos."""
     parser = argparse.ArgumentParser(description="Agents and Networks in Python")
     parser.add_argument("-b", "--batch", action="store_true", help="Ejecutar en modo batch (sin visualización)")
     parser.add_argument("--pbf", type=str, required=True, help="Archivo PBF para cargar datos OSM")
+    parser.add_argument("--trajectories", type=Path, default=None, help="Carpeta donde guardar las trayectorias (modo batch)")
+    parser.add_argument("--profile", type=Path, default=None, help="Archivo de perfilado (.json o .prom) (modo batch)")
+    parser.add_argument("--profile-steps", type=str, default=None, help="Rango de pasos INICIO:FIN para ejecutar cProfile")
+    parser.add_argument("--render", type=Path, default=None, help="Guardar el gráfico final de rutas (modo batch; por omisión no se renderiza)")
+    parser.add_argument("--no-basemap", action="store_true", help="Renderizar sin mapa base de OpenStreetMap")
+    parser.add_argument("--tile-cache", type=Path, default=TILE_CACHE_PATH, help="Carpeta de caché de teselas del mapa base")
+    parser.add_argument("--replications", type=int, default=0, help="Número de réplicas Monte Carlo a ejecutar en paralelo")
+    parser.add_argument("--commuters", type=int, default=100, help="Número de commuters por réplica")
+    parser.add_argument("--steps", type=int, default=MAX_STEPS, help="Máximo de pasos por réplica")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la primera réplica")
+    parser.add_argument("--processes", type=int, default=None, help="Procesos para las réplicas (por omisión, todos los núcleos)")
+    parser.add_argument("--crs", type=str, default="epsg:4326", help="CRS del modelo; uno proyectado en metros (p. ej. epsg:32719) simula en metros")
+    parser.add_argument("--output", type=Path, default=Path("outputs/replications.csv"), help="Tabla de métricas de las réplicas")
     return parser
 
 def load_osm_file(pbf_file_path):
@@ -22,15 +40,57 @@ def load_osm_file(pbf_file_path):
         raise ValueError(f"Archivo no encontrado: {pbf_file_path}")
     return OSM(str(pbf_file_path))
 
-def create_model(osm, num_commuters=10, commuter_speed=1.4, dgmodel=None):
+def make_replication_factory(osm, dgmodel, num_commuters, city="scl", crs="epsg:4326"):
+    """
+    Carga una sola vez el grafo vial y las redes por modo, y devuelve una fábrica de
+    modelos que los reutiliza (los procesos de las réplicas los heredan por fork).
+    """
+    road_graph = load_road_graph(osm, DATA_CRS, crs)
+    for network_type in ("walking", "cycling", "driving"):
+        osm.road_network(network_type, city, DATA_CRS, crs)
+    dgmodel.to_crs(DATA_CRS, crs)
+    osm.clear_layers()
+
+    def factory(seed, **params):
+        return ZorZim(
+            osm_object=osm,
+            data_crs=DATA_CRS,
+            model_crs=crs,
+            num_commuters=num_commuters,
+            demand_generation_model=dgmodel,
+            road_graph=road_graph,
+            render_output=None,
+            seed=seed,
+            **params,
+        )
+    return factory
+
+def make_profiler(args):
+    """Crea el `StepProfiler` pedido con `--profile`, o None."""
+    if args.profile is None:
+        return None
+    cprofile_steps = None
+    if args.profile_steps:
+        start, end = (int(step) for step in args.profile_steps.split(":"))
+        cprofile_steps = (start, end)
+    return StepProfiler(cprofile_steps=cprofile_steps, cprofile_output=args.profile.with_suffix(".pstats"))
+
+def create_model(
+    osm, num_commuters=10, commuter_speed=1.4, dgmodel=None, trajectory_recorder=None, profiler=None,
+    render_output=None, renderer=None, crs="epsg:4326",
+):
     """Crea el modelo ZorZim con parámetros dados."""
     return ZorZim(
         osm_object=osm,
-        data_crs="epsg:4326",
-        model_crs="epsg:4326",
+        data_crs=DATA_CRS,
+        model_crs=crs,
         num_commuters=num_commuters,
         commuter_speed=commuter_speed,
         demand_generation_model=dgmodel,
+        trajectory_recorder=trajectory_recorder,
+        profiler=profiler,
+        render_output=render_output,
+        renderer=renderer,
     )
 
 def agent_portrayal(agent):
@@ -61,29 +121,58 @@ if __name__ == "__main__":
     pbf_file_path = OSM_PATH / f"{args.pbf}.osm.pbf"
 
     try:
-        osm = load_osm_file(pbf_file_path)
+        # Extracción compartida: cada capa del PBF se lee una sola vez
+        osm = OSMExtract(load_osm_file(pbf_file_path))
 
         # Modelo de demanda aleatoria
-        dgmodel = RandomValparaisoDemandModel(osm_file_path=str(pbf_file_path), num_trips=3)
+        dgmodel = RandomValparaisoDemandModel(osm_file_path=str(pbf_file_path), num_trips=3, osm_object=osm)
 
         # Configuración de parámetros del modelo
         # Aquí se cambian el número de commuters
         model_params = {
             "osm_object": osm,
-            "data_crs": "epsg:4326",
-            "model_crs": "epsg:4326",
+            "data_crs": DATA_CRS,
+            "model_crs": args.crs,
             "num_commuters": 10,
             "commuter_speed": 1.4,
             "demand_generation_model": dgmodel,
         }
 
-        if args.batch:
+        if args.replications:
+            # Réplicas Monte Carlo en paralelo, con la red vial compartida
+            factory = make_replication_factory(osm, dgmodel, num_commuters=args.commuters, crs=args.crs)
+            results = run_replications(
+                factory, args.replications, base_seed=args.seed, max_steps=args.steps, processes=args.processes
+            )
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            results.to_csv(args.output)
+            print(results.describe().T[["mean", "std", "min", "max"]])
+            print(f"Resultados de {len(results)} réplicas guardados en {args.output}")
+        elif args.batch:
             # Ejecución en modo batch
-            model = create_model(osm, num_commuters=100, commuter_speed=1.4, dgmodel=dgmodel)
+            recorder = TrajectoryRecorder(args.trajectories) if args.trajectories else None
+            profiler = make_profiler(args)
+            # Sin --render el modo batch no importa matplotlib ni contextily
+            renderer = RenderStage(basemap=not args.no_basemap, tile_cache=args.tile_cache) if args.render else None
+            model = create_model(
+                osm, num_commuters=100, commuter_speed=1.4, dgmodel=dgmodel,
+                trajectory_recorder=recorder, profiler=profiler,
+                render_output=args.render, renderer=renderer, crs=args.crs,
+            )
             for _ in range(10):
                 model.step()
+            if recorder is not None:
+                recorder.flush()
+            if renderer is not None:
+                renderer.close()
+            if profiler is not None:
+                profiler.close()
+                profiler.export(args.profile)
             print("Simulación completada en modo batch.")
         else:
+            from mesa_geo.visualization import MapModule
+            from zorzim.visualization.server import agent_draw, clock_element, status_chart, trip_chart
+
             # Configuración del servidor de visualización
             map_element = MapModule(
                 portrayal_method=agent_draw,  # Vincular con la función agent_draw
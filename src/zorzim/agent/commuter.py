@@ -1,39 +1,71 @@
-from collections import OrderedDict
-import random
+import logging
+import math
+from collections import OrderedDict, deque
 from typing import List, Tuple
+import numpy as np
 from shapely.geometry import Point, LineString
 import mesa
 import mesa_geo as mg
 from zorzim.space.utils import redistribute_vertices
-from pyproj import Transformer
-from shapely.ops import transform
+from zorzim.model.agent_state import StateField, TRAIL_LENGTH, path_cumulative_lengths
+
+logger = logging.getLogger(__name__)
+
+# Tiempo diferido de evacuación: (probabilidad acumulada, minutos). El 37% restante no evacúa.
+EVACUATION_DELAYS = (
+    (0.30, 12),  # 30%: Tiempo promedio para empezar a evacuar (12 minutos)
+    (0.52, 20),  # 22%: Tiempo superior al promedio de evacuación (20 minutos)
+    (0.63, 5),   # 11%: Tiempo menor al promedio de evacuación (5 minutos)
+)
+
+def evacuation_times(rng, n):
+    """
+    Versión vectorizada de `Commuter._calculate_evacuation_time` para `n` agentes, con
+    NaN para los que no evacúan. Consume `rng` igual que `n` llamadas individuales.
+    """
+    rand = np.array([rng.random() for _ in range(n)])
+    thresholds = np.array([threshold for threshold, _ in EVACUATION_DELAYS])
+    minutes = np.array([delay for _, delay in EVACUATION_DELAYS] + [np.nan])
+    return minutes[np.searchsorted(thresholds, rand, side="right")]
 
 def calcular_distancia(coord1, coord2):
-    """Calcula la distancia entre dos coordenadas usando Shapely."""
-    punto1 = Point(coord1)
-    punto2 = Point(coord2)
-    return punto1.distance(punto2)
+    """Calcula la distancia euclidiana entre dos coordenadas (en unidades del CRS del modelo)."""
+    return math.hypot(coord2[0] - coord1[0], coord2[1] - coord1[1])
 
 class Commuter(mg.GeoAgent):
     """Clase que representa a un viajero dentro de la simulación."""
+    # Atributos que pasan a ser vistas sobre `CommuterState` cuando se usa el motor columnar
+    pos = StateField()
+    destination = StateField()
+    evacuation_time = StateField()
+    should_evacuate = StateField()
+    traveling = StateField()
+    has_reached_destination = StateField()
+    my_path = StateField()
+    step_in_path = StateField()
+    progress = StateField()
+    path_trail = StateField()
+
     def __init__(self, unique_id, model, geometry, schedule, crs, speed, evacuation_centers=None, fire_focus=None):
         if geometry is None or not isinstance(geometry, Point):
             raise ValueError(f"Error al inicializar el agente {unique_id}: geometría inválida {geometry}.")
         
         super().__init__(unique_id, model, geometry, crs)
         self.speed = speed
-        self.traveling = False
+        self.traveling = False  # Los cambios posteriores pasan por `_set_traveling`
         self.schedule = schedule
         self.next_move = self.schedule.popitem(last=False) if self.schedule else None
         self.pos = (geometry.x, geometry.y)  # Establecer posición inicial correctamente
         self.destination = self.next_move[1][1] if self.next_move else None
         self.my_path = []
+        self.path_lengths = np.empty(0)  # Distancia acumulada hasta cada nodo de `my_path`
+        self.path_edge_ids = np.empty(0, dtype=np.int64)  # Arista que sale de cada nodo (con congestión)
         self.step_in_path = 0
         self.color = "red"
-        self.path_trail = []
+        self.path_trail = deque(maxlen=TRAIL_LENGTH)  # Descarta lo más antiguo en O(1)
         self.active = True
         self.has_reached_destination = False 
-        self.progress = 0.0  # Progreso acumulado en el tramo actual
+        self.progress = 0.0  # Distancia recorrida en la ruta actual (movimiento continuo)
 
         # Parámetros adicionales
         self.evacuation_centers = evacuation_centers  # Centros posibles de evacuación
@@ -50,16 +82,11 @@ class Commuter(mg.GeoAgent):
         """Define el comportamiento del agente en cada paso."""
         #print(f"Agente {self.unique_id}: posición actual = {self.pos}, foco de incendio = {self.fire_focus}")
 
-        # Registrar el rastro del agente
+        # Registrar el rastro reciente del agente (las trayectorias completas las guarda
+        # el `TrajectoryRecorder` del modelo)
         if self.pos:
-            if not hasattr(self, "path_trail"):
-                self.path_trail = []  # Inicializar si no existe
             self.path_trail.append(self.pos)
 
-            # Limitar la longitud del rastro (opcional)
-            if len(self.path_trail) > 100:  # Ajusta el valor según sea necesario
-                self.path_trail.pop(0)
-
         if not self.should_evacuate:
             # Verifica si el agente tiene un tiempo diferido
             if self.evacuation_time is not None:
@@ -75,22 +102,21 @@ class Commuter(mg.GeoAgent):
     def _prepare_to_move(self) -> None:
         """Prepara al agente para moverse, asignándole una ruta."""
         self.model.space.move_commuter(self, pos=self.pos)
-        self.traveling = True
+        self._set_traveling(True)
         self._path_select()
 
     def _move(self):
-        """Mueve al agente hacia su destino nodo a nodo."""
+        """Mueve al agente hacia su destino nodo a nodo, o según su velocidad con movimiento continuo."""
         if not self.should_evacuate or not self.traveling or not self.my_path:
             return
 
+        if getattr(self.model, "continuous_movement", False):
+            self._move_continuous()
+            return
+
         # Verificar si el agente ha alcanzado el último nodo en la ruta
         if self.step_in_path >= len(self.my_path) - 1:
-            self.pos = self.destination
-            self.traveling = False
-            self.has_reached_destination = True  # Marcar como llegado
-            if not hasattr(self, "counted"):
-                self.model.got_to_destination += 1  # Incrementar el contador del modelo
-                self.counted = True  # Asegurar que no se cuente dos veces
+            self._arrive()
             return
 
         # Avanzar al siguiente nodo en el camino
@@ -100,26 +126,75 @@ class Commuter(mg.GeoAgent):
         self.pos = next_node
         #print(f"Agente {self.unique_id} se movió al nodo: {next_node}")
 
-    def _path_select(self):
-        """Calcula la ruta más corta o toma una desviación para el agente."""
+    def _move_continuous(self):
+        """Avanza `speed × dt` metros a lo largo de la ruta, interpolando dentro de la arista actual."""
+        step = self.speed * self.time_per_step * self.model.units_per_meter
+        congestion = getattr(self.model, "congestion", None)
+        if congestion is not None:
+            # La velocidad depende de la densidad de la arista actual
+            edge = self._current_edge()
+            if edge >= 0:
+                step *= congestion.speed_factor[edge]
+        self.progress += step
+        if self.progress >= self.path_lengths[-1]:
+            self._arrive()
+            return
+
+        # Último nodo ya alcanzado y fracción recorrida de la arista siguiente
+        i = int(np.searchsorted(self.path_lengths, self.progress, side="right")) - 1
+        t = (self.progress - self.path_lengths[i]) / (self.path_lengths[i + 1] - self.path_lengths[i])
+        (x0, y0), (x1, y1) = self.my_path[i], self.my_path[i + 1]
+        position = (x0 + t * (x1 - x0), y0 + t * (y1 - y0))
+        self.step_in_path = i
+        self.model.space.move_commuter(self, position)
+        self.pos = position
+
+    def _current_edge(self) -> int:
+        """Arista de la ruta en la que está el agente (-1 si no se conoce)."""
+        if self.step_in_path < len(self.path_edge_ids):
+            return int(self.path_edge_ids[self.step_in_path])
+        return -1
+
+    def _set_traveling(self, traveling: bool) -> None:
+        """Actualiza `traveling` y el contador de commuters en movimiento del modelo."""
+        if traveling != self.traveling:
+            self.model.num_traveling += 1 if traveling else -1
+        self.traveling = traveling
+
+    def _arrive(self):
+        # La posición final pasa por el mismo camino que los demás pasos (índices de la ciudad)
+        self.model.space.move_commuter(self, self.destination)
+        self.pos = self.destination
+        self._set_traveling(False)
+        self.has_reached_destination = True  # Marcar como llegado
+        if not hasattr(self, "counted"):
+            self.model.got_to_destination += 1  # Incrementar el contador del modelo
+            self.counted = True  # Asegurar que no se cuente dos veces
+
+    def _path_select(self, pending=None):
+        """
+        Calcula la ruta más corta o toma una desviación para el agente. Con `pending` (una
+        lista) la ruta directa no se calcula aquí: el agente se agrega a la lista para que
+        el modelo calcule las de todos juntos con `get_shortest_paths`.
+        """
         if not self.destination or not self.pos:
             # Si no hay un destino válido o la posición es inválida, limpiar la ruta
-            self.my_path = []
+            self._clear_path()
             return
 
         if self.pos == self.destination:
             # Si el agente ya está en el destino, no necesita moverse
-            self.my_path = []
+            self._clear_path()
             return
 
         # Determinar si el agente tomará una desviación
         desviacion_probabilidad = 0.2  # Probabilidad del 20% de tomar una desviación
-        desviacion = random.random() < desviacion_probabilidad
+        desviacion = self.model.random.random() < desviacion_probabilidad
 
         if desviacion:
             # Elegir un nodo intermedio aleatorio
-            all_nodes = list(self.model.coord_to_vertex.keys())
-            nodo_intermedio = random.choice(all_nodes)
+            vertices = self.model.vertices
+            nodo_intermedio = vertices.coord(vertices.random_vertex(self.model.random))
 
             # Ruta hasta el nodo intermedio
             path_to_intermediate = self.model.get_shortest_path(self.pos, nodo_intermedio)
@@ -134,27 +209,44 @@ class Commuter(mg.GeoAgent):
                 combined_path = []
 
             # Convertir vértices a coordenadas
-            self.my_path = [
-                self.model.vertex_to_coord[vertex]
-                for vertex in combined_path
-                if vertex in self.model.vertex_to_coord
-            ]
-
-            print(f"Agente {self.unique_id}: Tomó una desviación pasando por el nodo intermedio {nodo_intermedio}.")
+            self.my_path = self.model.vertices.path_coords(combined_path)
+            self._reset_progress()
+            self.model.register_path(self, combined_path)
+
+            self.model.profiler.count("detours")
+            logger.debug("Agente %s: tomó una desviación pasando por el nodo intermedio %s.", self.unique_id, nodo_intermedio)
+        elif pending is not None:
+            pending.append(self)
         else:
-            # Camino más corto estándar
+            self._select_shortest_path()
+
+    def _select_shortest_path(self, shortest_path_vertices=None) -> None:
+        """
+        Asigna el camino más corto desde la posición actual hasta el destino, sin
+        desviaciones. `shortest_path_vertices` entrega la ruta ya calculada por lotes.
+        """
+        if shortest_path_vertices is None:
             shortest_path_vertices = self.model.get_shortest_path(self.pos, self.destination)
-            if not shortest_path_vertices:
-                print(f"Agente {self.unique_id}: no se pudo calcular una ruta desde {self.pos} a {self.destination}")
-                self.my_path = []
-                return
+        if not shortest_path_vertices:
+            self.model.profiler.count("routing_failures")
+            logger.debug("Agente %s: no se pudo calcular una ruta desde %s a %s.", self.unique_id, self.pos, self.destination)
+            self._clear_path()
+            return
 
-            # Convertir vértices a coordenadas
-            self.my_path = [
-                self.model.vertex_to_coord[vertex]
-                for vertex in shortest_path_vertices
-                if vertex in self.model.vertex_to_coord
-            ]
+        # Convertir vértices a coordenadas
+        self.my_path = self.model.vertices.path_coords(shortest_path_vertices)
+        self._reset_progress()
+        self.model.register_path(self, shortest_path_vertices)
+
+    def _clear_path(self) -> None:
+        """Deja al agente sin ruta y lo quita de los índices de aristas del modelo."""
+        self.my_path = []
+        self.model.register_path(self, [])
+
+    def _reset_progress(self) -> None:
+        """Reinicia el avance continuo al asignar una ruta nueva."""
+        self.path_lengths = path_cumulative_lengths(self.my_path)
+        self.progress = 0.0
 
     def _redistribute_path_vertices(self) -> None:
         """Distribuye puntos en la ruta para simular un movimiento más fluido."""
@@ -163,28 +255,22 @@ class Commuter(mg.GeoAgent):
             reduced_speed = self.speed * 10.0  # Ajusta velocidad
             redistributed_path = redistribute_vertices(original_path, reduced_speed)
             self.my_path = list(redistributed_path.coords)
+            self._reset_progress()
 
     def _calculate_evacuation_time(self):
         """Calcula el tiempo de evacuación del agente basado en probabilidades."""
-        rand = random.random()  # Genera un número entre 0 y 1
-        if rand < 0.30:  # 30%: Tiempo promedio para empezar a evacuar (12 minutos)
-            return 12
-        elif rand < 0.52:  # 22%: Tiempo superior al promedio de evacuación (20 minutos)
-            return 20
-        elif rand < 0.63:  # 11%: Tiempo menor al promedio de evacuación (5 minutos)
-            return 5
-        else:  # 37%: No evacua
-            return None  # Representa que no evacuará
+        rand = self.model.random.random()  # Genera un número entre 0 y 1
+        for threshold, minutes in EVACUATION_DELAYS:
+            if rand < threshold:
+                return minutes
+        return None  # 37%: No evacúa
         
     def _check_proximity_to_fire(self):
         if self.fire_focus is None:
             return
 
-        fire_point = Point(self.fire_focus)
-        agent_point = Point(self.pos)
-
-        # Calcular distancia directamente en grados
-        distance_to_fire = agent_point.distance(fire_point)
+        # Distancia en unidades del CRS del modelo (metros en un CRS proyectado)
+        distance_to_fire = calcular_distancia(self.pos, self.fire_focus)
 
         # Usar el valor correcto del radio
         #print(f"Agente {self.unique_id}: distancia al fuego = {distance_to_fire}, radio de evacuación = {self.model.fire_radius_value}")
@@ -198,16 +284,16 @@ class Commuter(mg.GeoAgent):
             #print(f"Agente {self.unique_id}: fuera del radio de evacuación.")
             self.should_evacuate = False
 
-    def _assign_evacuation_center(self):
-        """Asigna un centro de evacuación y calcula la ruta."""
+    def _assign_evacuation_center(self, pending=None):
+        """Asigna un centro de evacuación y calcula la ruta (ver `_path_select` para `pending`)."""
         if not self.evacuation_centers:
             #print(f"Agente {self.unique_id}: No hay centros de evacuación disponibles.")
             return
 
-        # Asignar un centro de evacuación aleatorio
-        self.destination = random.choice(self.evacuation_centers)
-        self.traveling = True
-        self._path_select()
+        # Asignar el centro de evacuación más cercano por la red (con cupo)
+        self.destination = self.model.assign_shelter(self)
+        self._set_traveling(True)
+        self._path_select(pending)
         #print(f"Agente {self.unique_id} asignado al centro de evacuación: {self.destination}")
         
 class MarkerAgent(mg.GeoAgent):
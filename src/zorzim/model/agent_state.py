@@ -0,0 +1,345 @@
+'''
+Motor columnar opcional para el estado de los commuters.
+
+Las posiciones, temporizadores de evacuación, banderas y cursores de ruta de todos los
+commuters viven en arreglos de NumPy, y un paso de simulación se reduce a unas pocas
+operaciones vectorizadas. Los objetos `Commuter` siguen existiendo para Mesa y la
+visualización, pero sus atributos pasan a ser vistas sobre estas columnas.
+'''
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from zorzim.agent.commuter import Commuter
+
+TRAIL_LENGTH = 100  # Largo máximo del rastro de cada agente
+
+
+def path_cumulative_lengths(path) -> np.ndarray:
+    """Distancia recorrida (en unidades del CRS) desde el inicio de `path` hasta cada uno de sus nodos."""
+    coords = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if not len(coords):
+        return np.empty(0)
+    return np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(coords, axis=0).T))))
+
+
+class StateField:
+    """
+    Atributo de `Commuter` que se guarda en el propio objeto mientras el agente no esté
+    asociado a un `CommuterState`, y en la columna correspondiente una vez asociado.
+    """
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+        self.private = f"_{name}"
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        state = agent.__dict__.get("_state")
+        if state is None:
+            return agent.__dict__.get(self.private)
+        return state.get(self.name, agent.__dict__["_row"])
+
+    def __set__(self, agent, value) -> None:
+        state = agent.__dict__.get("_state")
+        if state is None:
+            agent.__dict__[self.private] = value
+        else:
+            state.set(self.name, agent.__dict__["_row"], value)
+
+
+class CommuterState:
+    """
+    Estado columnar (structure of arrays) de un conjunto de commuters.
+
+    El rastro reciente de cada agente ocupa `size × trail_length` posiciones; con
+    `trail_length=0` no se reserva ni se registra (por ejemplo, cuando las trayectorias
+    las guarda un `TrajectoryRecorder`).
+    """
+    commuters: List["Commuter"]
+    x: np.ndarray
+    y: np.ndarray
+    dest_x: np.ndarray
+    dest_y: np.ndarray
+    evacuation_time: np.ndarray  # NaN representa None (no evacua por iniciativa propia)
+    should_evacuate: np.ndarray
+    traveling: np.ndarray
+    reached: np.ndarray
+    counted: np.ndarray
+    path_start: np.ndarray
+    path_length: np.ndarray
+    cursor: np.ndarray
+    progress: np.ndarray
+    speed: np.ndarray
+
+    def __init__(self, size: int, trail_length: int = TRAIL_LENGTH) -> None:
+        self.commuters = []
+        self.x = np.full(size, np.nan)
+        self.y = np.full(size, np.nan)
+        self.dest_x = np.full(size, np.nan)
+        self.dest_y = np.full(size, np.nan)
+        self.evacuation_time = np.full(size, np.nan)
+        self.should_evacuate = np.zeros(size, dtype=bool)
+        self.traveling = np.zeros(size, dtype=bool)
+        self.reached = np.zeros(size, dtype=bool)
+        self.counted = np.zeros(size, dtype=bool)
+
+        # Rutas concatenadas en un único búfer; cada agente guarda su inicio y largo
+        self.path_start = np.zeros(size, dtype=np.int64)
+        self.path_length = np.zeros(size, dtype=np.int64)
+        self.cursor = np.zeros(size, dtype=np.int64)
+        self._path_x = np.empty(1024)
+        self._path_y = np.empty(1024)
+        self._path_cum = np.empty(1024)  # Distancia acumulada a lo largo de cada ruta
+        self._path_edge = np.empty(1024, dtype=np.int64)  # Arista que sale de cada nodo (-1 si no se conoce)
+
+        # Movimiento continuo: distancia recorrida en la ruta actual y velocidad (m/s)
+        self.progress = np.zeros(size)
+        self.speed = np.zeros(size)
+        self._path_used = 0
+
+        # Rastro reciente de cada agente en un búfer circular
+        self.trail_length = trail_length
+        self.trail_x = np.empty((size, trail_length))
+        self.trail_y = np.empty((size, trail_length))
+        self.trail_head = np.zeros(size, dtype=np.int64)
+        self.trail_count = np.zeros(size, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @classmethod
+    def from_commuters(cls, commuters: Sequence["Commuter"], trail_length: int = TRAIL_LENGTH) -> "CommuterState":
+        """Copia el estado de `commuters` a columnas y los convierte en vistas sobre ellas."""
+        state = cls(len(commuters), trail_length)
+        for row, commuter in enumerate(commuters):
+            values = {name: getattr(commuter, name) for name in FIELDS}
+            commuter.__dict__["_state"] = state
+            commuter.__dict__["_row"] = row
+            for name, value in values.items():
+                state.set(name, row, value)
+            state.counted[row] = hasattr(commuter, "counted")
+            state.speed[row] = commuter.speed
+            state.commuters.append(commuter)
+        return state
+
+    # Acceso por agente, usado por las vistas `StateField`
+
+    def get(self, name: str, row: int):
+        if name == "pos":
+            if np.isnan(self.x[row]):
+                return None
+            return (float(self.x[row]), float(self.y[row]))
+        if name == "destination":
+            if np.isnan(self.dest_x[row]):
+                return None
+            return (float(self.dest_x[row]), float(self.dest_y[row]))
+        if name == "evacuation_time":
+            value = self.evacuation_time[row]
+            return None if np.isnan(value) else float(value)
+        if name == "my_path":
+            start, end = self.path_start[row], self.path_start[row] + self.path_length[row]
+            return list(zip(self._path_x[start:end].tolist(), self._path_y[start:end].tolist()))
+        if name == "step_in_path":
+            return int(self.cursor[row])
+        if name == "progress":
+            return float(self.progress[row])
+        if name == "has_reached_destination":
+            return bool(self.reached[row])
+        if name == "path_trail":
+            count, head = self.trail_count[row], self.trail_head[row]
+            if not count:
+                return []
+            order = (head - count + np.arange(count)) % self.trail_length
+            return list(zip(self.trail_x[row, order].tolist(), self.trail_y[row, order].tolist()))
+        return bool(getattr(self, name)[row])
+
+    def set(self, name: str, row: int, value) -> None:
+        if name == "pos":
+            self.x[row], self.y[row] = value if value is not None else (np.nan, np.nan)
+        elif name == "destination":
+            self.dest_x[row], self.dest_y[row] = value if value is not None else (np.nan, np.nan)
+        elif name == "evacuation_time":
+            self.evacuation_time[row] = np.nan if value is None else value
+        elif name == "my_path":
+            self._set_path(row, value or [])
+        elif name == "step_in_path":
+            self.cursor[row] = value
+        elif name == "progress":
+            self.progress[row] = value
+        elif name == "has_reached_destination":
+            self.reached[row] = value
+        elif name == "path_trail":
+            value = list(value or [])[-self.trail_length:] if self.trail_length else []
+            self.trail_count[row] = len(value)
+            self.trail_head[row] = len(value) % self.trail_length if self.trail_length else 0
+            if value:
+                self.trail_x[row, :len(value)], self.trail_y[row, :len(value)] = np.asarray(value, dtype=np.float64).T
+        else:
+            getattr(self, name)[row] = bool(value)
+
+    def _set_path(self, row: int, path) -> None:
+        coords = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        n = len(coords)
+        if self._path_used + n > len(self._path_x):
+            self._grow_paths(n)
+        start = self._path_used
+        self._path_x[start:start + n] = coords[:, 0]
+        self._path_y[start:start + n] = coords[:, 1]
+        self._path_cum[start:start + n] = path_cumulative_lengths(coords)
+        self._path_edge[start:start + n] = -1
+        self._path_used += n
+        self.path_start[row] = start
+        self.path_length[row] = n
+        self.progress[row] = 0.0
+
+    def _grow_paths(self, needed: int) -> None:
+        """Compacta el búfer de rutas (descartando rutas reemplazadas) y lo agranda si hace falta."""
+        live = int(self.path_length.sum())
+        capacity = max(1024, 2 * (live + needed))
+        path_x, path_y, path_cum = np.empty(capacity), np.empty(capacity), np.empty(capacity)
+        path_edge = np.empty(capacity, dtype=np.int64)
+        offset = 0
+        for row in np.flatnonzero(self.path_length):
+            start, n = self.path_start[row], self.path_length[row]
+            path_x[offset:offset + n] = self._path_x[start:start + n]
+            path_y[offset:offset + n] = self._path_y[start:start + n]
+            path_cum[offset:offset + n] = self._path_cum[start:start + n]
+            path_edge[offset:offset + n] = self._path_edge[start:start + n]
+            self.path_start[row] = offset
+            offset += n
+        self._path_x, self._path_y, self._path_cum, self._path_used = path_x, path_y, path_cum, offset
+        self._path_edge = path_edge
+
+    def set_path_edges(self, row: int, edge_ids: np.ndarray) -> None:
+        """Ids de las aristas de la ruta actual de `row` (una menos que sus nodos)."""
+        start, n = self.path_start[row], self.path_length[row]
+        edge_ids = np.asarray(edge_ids, dtype=np.int64)[:max(n - 1, 0)]
+        self._path_edge[start:start + len(edge_ids)] = edge_ids
+
+    def current_edges(self, rows: np.ndarray) -> np.ndarray:
+        """Arista en la que está (o por la que sale) cada agente de `rows`; -1 al final de la ruta."""
+        edges = self._path_edge[self.path_start[rows] + self.cursor[rows]]
+        return np.where(self.path_length[rows] > 0, edges, -1)
+
+    # Paso vectorizado
+
+    def _record_trail(self) -> None:
+        if not self.trail_length:
+            return
+        rows = np.flatnonzero(~np.isnan(self.x))
+        head = self.trail_head[rows]
+        self.trail_x[rows, head] = self.x[rows]
+        self.trail_y[rows, head] = self.y[rows]
+        self.trail_head[rows] = (head + 1) % self.trail_length
+        self.trail_count[rows] = np.minimum(self.trail_count[rows] + 1, self.trail_length)
+
+    def _arrive(self, rows: np.ndarray, model) -> None:
+        self.x[rows] = self.dest_x[rows]
+        self.y[rows] = self.dest_y[rows]
+        model.num_traveling -= int(np.count_nonzero(self.traveling[rows]))
+        self.traveling[rows] = False
+        self.reached[rows] = True
+        model.got_to_destination += int(np.count_nonzero(~self.counted[rows]))
+        self.counted[rows] = True
+
+    def _advance_nodes(self, moving: np.ndarray, model) -> np.ndarray:
+        """Avanza un nodo por paso (movimiento original de `Commuter._move`)."""
+        at_end = moving & (self.cursor >= self.path_length - 1)
+        arrived = np.flatnonzero(at_end)
+        self._arrive(arrived, model)
+
+        advancing = np.flatnonzero(moving & ~at_end)
+        self.cursor[advancing] += 1
+        nodes = self.path_start[advancing] + self.cursor[advancing]
+        self.x[advancing] = self._path_x[nodes]
+        self.y[advancing] = self._path_y[nodes]
+        return np.concatenate((arrived, advancing))
+
+    def _advance_continuous(self, moving: np.ndarray, model) -> np.ndarray:
+        """Avanza `speed × dt` a lo largo de cada ruta, interpolando dentro de la arista actual."""
+        rows = np.flatnonzero(moving)
+        step = self.speed[rows] * model.time_per_step * model.units_per_meter
+        if model.congestion is not None:
+            # La velocidad depende de la densidad de la arista actual
+            step *= model.congestion.factors(self.current_edges(rows))
+        self.progress[rows] += step
+        start = self.path_start[rows]
+        end = start + self.path_length[rows]
+        done = self.progress[rows] >= self._path_cum[end - 1]
+        arrived = rows[done]
+        self._arrive(arrived, model)
+
+        rows, start, end = rows[~done], start[~done], end[~done]
+        progress = self.progress[rows]
+        # Búsqueda binaria vectorizada del último nodo con distancia acumulada <= progreso
+        # (un `searchsorted` por ruta, todas a la vez)
+        lo, hi = start.copy(), end.copy()
+        last = len(self._path_cum) - 1
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = np.minimum((lo + hi) // 2, last)
+            right = active & (self._path_cum[mid] <= progress)
+            lo = np.where(right, mid + 1, lo)
+            hi = np.where(active & ~right, mid, hi)
+        node = lo - 1
+
+        edge = self._path_cum[node + 1] - self._path_cum[node]
+        t = (progress - self._path_cum[node]) / edge
+        self.x[rows] = self._path_x[node] + t * (self._path_x[node + 1] - self._path_x[node])
+        self.y[rows] = self._path_y[node] + t * (self._path_y[node + 1] - self._path_y[node])
+        self.cursor[rows] = node - start
+        return np.concatenate((arrived, rows))
+
+    def step(self, model) -> np.ndarray:
+        """
+        Ejecuta un paso para todos los commuters, con la misma lógica que `Commuter.step`.
+        Devuelve las filas de los agentes que cambiaron de posición, incluidos los que
+        llegaron a su destino en este paso.
+        """
+        self._record_trail()
+        evacuating = self.should_evacuate.copy()
+
+        # Agentes evacuando: avanzan por su ruta o llegan a su destino
+        moving = evacuating & self.traveling & (self.path_length > 0)
+        if model.continuous_movement:
+            advancing = self._advance_continuous(moving, model)
+        else:
+            advancing = self._advance_nodes(moving, model)
+
+        # Agentes esperando: descuentan su tiempo diferido y, al agotarse, revisan el fuego
+        waiting = ~evacuating & ~np.isnan(self.evacuation_time)
+        self.evacuation_time[waiting] -= model.time_per_step / 60
+        expired = np.flatnonzero(waiting & (self.evacuation_time <= 0))
+        if len(expired):
+            self.evacuation_time[expired] = np.nan
+            if model.fire_focus is not None:
+                fire_x, fire_y = model.fire_focus
+                inside = np.hypot(self.x[expired] - fire_x, self.y[expired] - fire_y) <= model.fire_radius_value
+                self.should_evacuate[expired[~inside]] = False
+                # Sólo quienes empiezan a evacuar necesitan trabajo por agente (ruteo)
+                model.start_evacuation([self.commuters[row] for row in expired[inside]])
+        return advancing
+
+    def all_evacuated(self) -> bool:
+        """True si todos los agentes que deben evacuar llegaron a su destino."""
+        return bool(np.all(self.reached[self.should_evacuate]))
+
+
+FIELDS = (
+    "pos",
+    "destination",
+    "evacuation_time",
+    "should_evacuate",
+    "traveling",
+    "has_reached_destination",
+    "my_path",
+    "step_in_path",
+    "progress",
+    "path_trail",
+)
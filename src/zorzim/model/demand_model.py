@@ -7,8 +7,12 @@ from collections import OrderedDict
 from pathlib import Path
 import pandas as pd
 from aves.data import eod
+import numpy as np
 from pyrosm import OSM
+import pyproj
 from shapely.geometry import Polygon, MultiPolygon, LineString, MultiLineString
+from zorzim.space.network_cache import NetworkCache
+from zorzim.space.utils import UnitTransformer
 
 class DemandGenerationModel(abc.ABC):
     '''
@@ -71,16 +75,49 @@ class RandomValparaisoDemandModel(DemandGenerationModel):
     Modelo de generación de demanda aleatoria para Valparaíso.
     Usa los edificios como posiciones de origen y puntos en las carreteras como posiciones de destino.
     """
-    def __init__(self, osm_file_path: str, num_trips=2) -> None:
-        # Cargar el archivo OSM
-        self.osm = OSM(osm_file_path)
+    def __init__(self, osm_file_path: str, num_trips=2, osm_object=None) -> None:
+        # Reutilizar el objeto OSM (o la extracción compartida) si se entrega uno
+        self.osm = osm_object if osm_object is not None else OSM(osm_file_path)
         self.num_trips = num_trips  # Número de viajes que cada agente realizará
 
+        # Las coordenadas se guardan en la caché de redes, sin reproyectar
+        cache = NetworkCache.from_osm(self.osm, "source", "source")
+
         # Calcular y almacenar las coordenadas de los edificios
-        self.building_coords = self._get_building_coords()
+        self.building_coords = self._load_coords(cache, "buildings", self._get_building_coords)
 
         # Obtener las coordenadas de las carreteras para destinos
-        self.road_coords = self._get_road_coords()
+        self.road_coords = self._load_coords(cache, "driving_coords", self._get_road_coords)
+        self.crs = None  # CRS de las coordenadas; None mientras estén en el CRS del archivo OSM
+
+    def to_crs(self, data_crs, model_crs) -> None:
+        """
+        Reproyecta de una vez las coordenadas de edificios y carreteras al CRS del modelo.
+        No hace nada si ya están en ese CRS.
+        """
+        source = pyproj.CRS.from_user_input(self.crs if self.crs is not None else data_crs)
+        target = pyproj.CRS.from_user_input(model_crs)
+        if source == target:
+            return
+        transformer = UnitTransformer(degree_crs=source, meter_crs=target)
+        for name in ("building_coords", "road_coords"):
+            coords = np.asarray(getattr(self, name), dtype=np.float64).reshape(-1, 2)
+            x, y = transformer.degree2meter_xy(coords[:, 0], coords[:, 1])
+            setattr(self, name, list(zip(x.tolist(), y.tolist())))
+        self.crs = model_crs
+
+    @staticmethod
+    def _load_coords(cache, layer, extract):
+        """Lee una capa de coordenadas desde la caché o la extrae del archivo OSM."""
+        if cache is not None:
+            cached = cache.load_array(layer)
+            if cached is not None:
+                return list(map(tuple, cached.tolist()))
+
+        coords = extract()
+        if cache is not None:
+            cache.save_array(layer, np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+        return coords
 
     def _get_building_coords(self):
         """Obtiene las coordenadas de los edificios a partir del archivo OSM."""
@@ -130,15 +167,15 @@ class RandomValparaisoDemandModel(DemandGenerationModel):
         #print(f"{len(road_coords)} puntos de carretera encontrados.")
         return road_coords
 
-    def get_random_building(self):
+    def get_random_building(self, rng: random.Random = random):
         """Selecciona una coordenada aleatoria de entre los edificios."""
         if not self.building_coords:
             raise ValueError("No hay edificios disponibles para seleccionar.")
-        return random.choice(self.building_coords)
+        return rng.choice(self.building_coords)
 
-    def get_random_road_destination(self):
+    def get_random_road_destination(self, rng: random.Random = random):
         """Selecciona una coordenada aleatoria de entre las carreteras."""
-        return random.choice(self.road_coords)
+        return rng.choice(self.road_coords)
 
     def get_agent_schedule(self, unique_id: int) -> OrderedDict:
         """
@@ -0,0 +1,66 @@
+'''
+Recolección de métricas del modelo en un búfer columnar.
+'''
+from __future__ import annotations
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class MetricsCollector:
+    """
+    Reemplazo liviano de `mesa.DataCollector` para reporteros del modelo.
+
+    Cada reportero debe ser O(1) (leer contadores que el modelo mantiene al día, no
+    recorrer a los agentes). Los valores se guardan en arreglos de NumPy que crecen al
+    doble cuando se llenan, y sólo se registra uno de cada `collect_every` pasos.
+    Expone `model_vars` y `get_model_vars_dataframe` igual que `mesa.DataCollector`, por
+    lo que sirve para los `ChartModule` de la visualización.
+    """
+    model_reporters: Dict[str, Callable]
+    collect_every: int
+
+    def __init__(self, model_reporters: Dict[str, Callable], collect_every: int = 1, capacity: int = 1024) -> None:
+        if collect_every < 1:
+            raise ValueError("collect_every debe ser al menos 1.")
+        self.model_reporters = model_reporters
+        self.collect_every = collect_every
+        self._steps = np.empty(capacity, dtype=np.int64)
+        self._columns = {name: np.empty(capacity) for name in model_reporters}
+        self._used = 0
+
+    def __len__(self) -> int:
+        return self._used
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._steps)
+        self._steps = np.resize(self._steps, capacity)
+        self._columns = {name: np.resize(column, capacity) for name, column in self._columns.items()}
+
+    def collect(self, model, step: Optional[int] = None, force: bool = False) -> None:
+        """
+        Registra los reporteros en el paso `step`. Se registra siempre si no se indica el
+        paso o con `force=True` (por ejemplo, en el último paso de la simulación).
+        """
+        if step is not None and step % self.collect_every and not force:
+            return
+        if self._used == len(self._steps):
+            self._grow()
+        self._steps[self._used] = step if step is not None else -1
+        for name, reporter in self.model_reporters.items():
+            self._columns[name][self._used] = reporter(model)
+        self._used += 1
+
+    @property
+    def steps(self) -> np.ndarray:
+        return self._steps[:self._used]
+
+    @property
+    def model_vars(self) -> Dict[str, np.ndarray]:
+        return {name: column[:self._used] for name, column in self._columns.items()}
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        frame = pd.DataFrame(self.model_vars)
+        frame.index = pd.Index(self.steps, name="Paso")
+        return frame
@@ -6,7 +6,7 @@ from mesa.space import FloatCoordinate
 from pyrosm import OSM
 from zorzim.model.mode import Mode, SingleStageNetworkMode
 from zorzim.space.city import get_distance
-from zorzim.space.road_network import RoadNetwork, CyclingNetwork, DrivingNetwork, WalkingNetwork
+from zorzim.space.osm_extract import OSMExtract
 from zorzim.space.utils import Mode, SingleStageNetworkMode, get_distance
 
 class ModalSplitModel(abc.ABC):
@@ -65,23 +65,15 @@ class WalkingAndCyclingModel(ModalSplitModel):
     def fit(self, city: str, data_crs: str, model_crs: str, osm_object: OSM) -> None:
         self.data_crs = data_crs
         self.model_crs = model_crs
+        # Las redes se obtienen de la extracción compartida para no construirlas dos veces
+        extract = OSMExtract.wrap(osm_object)
         self.walking_mode = SingleStageNetworkMode(
             self.walking_speed,
-            WalkingNetwork(
-                city=city,
-                data_crs=self.data_crs,
-                model_crs=self.model_crs,
-                osm_object=osm_object
-            )
+            extract.road_network("walking", city, self.data_crs, self.model_crs)
         )
         self.cycling_mode = SingleStageNetworkMode(
             self.cycling_speed,
-            CyclingNetwork(
-                city=city,
-                data_crs=self.data_crs,
-                model_crs=self.model_crs,
-                osm_object=osm_object
-            )
+            extract.road_network("cycling", city, self.data_crs, self.model_crs)
         )
 
 
@@ -1,44 +1,79 @@
-import uuid
-import time
-import random
-from functools import partial
-import os
+import logging
 
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 import mesa
-import mesa_geo as mg
 from pyrosm import OSM
-from shapely.geometry import Point, LineString, MultiLineString
-from graph_tool.all import Graph, shortest_path
+from shapely.geometry import Point
+from graph_tool.all import shortest_path
 import pyproj
-from shapely.ops import transform
-import matplotlib.pyplot as plt
-import contextily as ctx
 
-from zorzim.agent.commuter import Commuter, MarkerAgent, FireRadiusAgent
-from zorzim.model.demand_model import DemandGenerationModel, RandomDemandGenerationModel
-from zorzim.model.mode_model import ModalSplitModel, WalkingAndCyclingModel
+from zorzim.agent.commuter import Commuter, MarkerAgent, FireRadiusAgent, evacuation_times
+from zorzim.model.agent_state import TRAIL_LENGTH, CommuterState
+from zorzim.model.demand_model import RandomDemandGenerationModel
+from zorzim.model.metrics import MetricsCollector
+from zorzim.model.mode_model import WalkingAndCyclingModel
+from zorzim.model.profiling import StepProfiler
+from zorzim.model.scheduler import EventScheduler
+from zorzim.model.trajectory import STATUS_ARRIVED, STATUS_EVACUATING, STATUS_IDLE, STATUS_WAITING
+from zorzim.space.batch_routing import batch_routes
 from zorzim.space.city import City
-from zorzim.space.road_network import DrivingNetwork, WalkingNetwork
+from zorzim.space.congestion import CongestionModel, road_lanes
+from zorzim.space.distance_field import EdgeMatrix
+from zorzim.space.fire_front import EdgeAgentIndex, FireFront
+from zorzim.space.hazard import HazardMask
+from zorzim.space.network_cache import NetworkCache
+from zorzim.space.osm_extract import OSMExtract
+from zorzim.space.road_graph import EdgeLookup, build_road_graph
+from zorzim.space.route_cache import RouteCache
+from zorzim.space.shelters import ShelterField
+from zorzim.space.utils import units_per_meter
+from zorzim.space.vertices import VertexStore
+from zorzim.visualization.render import RenderStage, plot_agent_paths_with_map
+
+logger = logging.getLogger(__name__)
 
 
 def get_time(model) -> pd.Timedelta:
     return pd.Timedelta(days=model.day, hours=model.time // 60, minutes=model.time % 60)
 
 def get_num_commuters_by_status(model, traveling: bool) -> int:
-    count = sum(1 for commuter in model.schedule.agents if commuter.traveling == traveling)
-    print(f"Agentes {'en movimiento' if traveling else 'detenidos'}: {count}")
-    return count
+    # Contador mantenido por los propios commuters al cambiar `traveling` (O(1))
+    if traveling:
+        return model.num_traveling
+    return model.schedule.get_agent_count() - model.num_traveling
 
 def get_got_to_destination(model) -> int:
-    print(f"Agentes en destino: {model.got_to_destination}")
     return model.got_to_destination
 
 def get_time_in_hours(model):
     # Convierte pasos a horas (asumiendo 1 paso = 5 minutos)
     return model.time // 60
 
+def load_road_graph(osm: OSMExtract, data_crs: str, model_crs: str):
+    """
+    Carga (desde la caché de redes, o construyéndolo desde OSM) el grafo vial completo.
+    Devuelve `(grafo, pesos, VertexStore)`; el grafo no se modifica durante la simulación,
+    así que puede compartirse entre varias instancias del modelo.
+    """
+    osm = OSMExtract.wrap(osm)
+    cache = NetworkCache.from_osm(osm, data_crs, model_crs)
+    cached = cache.load_graph("all") if cache is not None else None
+
+    if cached is not None:
+        G, coords, index = cached
+        return G, G.ep["weight"], VertexStore(coords[:, 0], coords[:, 1], index=index)
+
+    roads = osm.get_network(network_type="all")
+    if pyproj.CRS.from_user_input(data_crs) != pyproj.CRS.from_user_input(model_crs):
+        # Se reproyecta una sola vez al cargar: el resto del modelo trabaja en el CRS del modelo
+        roads = roads.set_crs(data_crs, allow_override=True).to_crs(model_crs)
+    G, edge_weights, vertices = build_road_graph(roads.geometry, lanes=road_lanes(roads))
+    if cache is not None:
+        G.ep["weight"] = edge_weights
+        cache.save_graph("all", G, vertices.coords, vertices.index)
+    return G, edge_weights, vertices
+
 class ZorZim(mesa.Model):
     def __init__(
         self,
@@ -55,11 +90,36 @@ class ZorZim(mesa.Model):
         change_probability=0.3,  # Probabilidad de cambio
         radius_change_amount=50,  # Magnitud del cambio (en metros)
         max_radius=1000,  # Nuevo: límite superior del radio
-        min_radius=50     # Nuevo: límite inferior del radio
+        min_radius=50,    # Nuevo: límite inferior del radio
+        fire_spread_speed=None,  # Velocidad del frente de fuego por la red (metros por minuto)
+        num_fire_foci=1,  # Focos de ignición del frente de fuego
+        columnar_state=False,  # Estado de los commuters en arreglos de NumPy (paso vectorizado)
+        event_scheduler=False,  # Activar sólo a los agentes con eventos pendientes
+        skip_idle_steps=True,   # Con `event_scheduler`, saltar los pasos sin eventos
+        trajectory_recorder=None,  # `TrajectoryRecorder` para guardar las trayectorias completas
+        continuous_movement=False,  # Avanzar `speed × time_per_step` metros por paso en vez de un nodo
+        congestion=False,  # Con `continuous_movement`, la velocidad depende de la densidad de cada arista
+        evacuation_centers=None,  # Coordenadas de los refugios; por omisión se eligen al azar
+        num_evacuation_centers=2,  # Refugios elegidos al azar si no se entregan `evacuation_centers`
+        shelter_capacity=None,  # Cupo de cada refugio (un valor o uno por refugio); None = ilimitado
+        metrics_every=1,  # Registrar las métricas del modelo cada `metrics_every` pasos
+        profiler=None,  # `StepProfiler` para medir las fases de cada paso
+        render_output="agent_paths_with_map.png",  # Gráfico final de rutas; None para no renderizar
+        renderer=None,  # `RenderStage` que renderiza en segundo plano
+        road_graph=None,  # Grafo vial ya cargado con `load_road_graph`, compartido entre modelos
+        seed=None  # Semilla de `self.random` (la usa `mesa.Model` al crear el modelo)
     ) -> None:
         super().__init__()
-        self.osm = osm_object
-        self.schedule = mesa.time.RandomActivation(self)
+        if columnar_state and event_scheduler:
+            raise ValueError("columnar_state y event_scheduler no se pueden usar a la vez.")
+        if congestion and not continuous_movement:
+            raise ValueError("congestion requiere continuous_movement.")
+        self.osm = OSMExtract.wrap(osm_object)
+        if event_scheduler:
+            self.schedule = EventScheduler(self, minutes_per_step=time_per_step / 60)
+        else:
+            self.schedule = mesa.time.RandomActivation(self)
+        self.skip_idle_steps = skip_idle_steps
         self.commuter_speed = commuter_speed
         self.data_crs = data_crs
         self.model_crs = model_crs
@@ -69,71 +129,112 @@ class ZorZim(mesa.Model):
         self.modal_split_model = modal_split_model
         self.time_per_step = time_per_step
         self.fire_focus = None
-        self.evacuation_centers = []
-        self.evacuation_radius = evacuation_radius / 111000
+        self.evacuation_centers = list(evacuation_centers or [])
+        self.num_evacuation_centers = num_evacuation_centers
+        # Unidades del CRS por metro: 1 con un CRS proyectado en metros, ~1/111000 en grados
+        self.units_per_meter = units_per_meter(model_crs)
+        self.evacuation_radius = evacuation_radius * self.units_per_meter
         self.fire_radius_value = self.evacuation_radius  # Unifica los valores
+        self._notified_radius = None  # Mayor radio ya notificado (None: ninguno todavía)
         self.step_count = 0  # Contador de pasos
         self.step_interval = step_interval
         self.change_probability = change_probability
-        self.radius_change_amount = radius_change_amount / 111000  # Convertir a grados
-        self.max_radius = max_radius / 111000  # Límite superior en grados
-        self.min_radius = min_radius / 111000  # Límite inferior en grados
+        self.radius_change_amount = radius_change_amount * self.units_per_meter  # Convertir a unidades del CRS
+        self.max_radius = max_radius * self.units_per_meter  # Límite superior
+        self.min_radius = min_radius * self.units_per_meter  # Límite inferior
         self.all_paths = []
+        self.profiler = profiler if profiler is not None else StepProfiler(enabled=False)
+        self.render_output = render_output
+        self.renderer = renderer
+        self.continuous_movement = continuous_movement
 
 
-        # Inicializar caché de rutas
-        self.route_cache = {}  # Aquí inicializamos el caché para las rutas calculadas
+        # Inicializar caché de rutas (por pares de vértices; se vacía al cambiar la máscara de peligro)
+        self.route_cache = RouteCache(symmetric=True)
 
         Commuter.SPEED = commuter_speed * 300.0  # meters per tick (5 minutes)
 
-        self._load_road_vertices_from_file(osm_object, city="scl")
+        self._load_road_vertices_from_file(self.osm, city="scl")
+        if hasattr(self.demand_generation_model, "to_crs"):
+            # Orígenes y destinos en el mismo CRS que la red (se reproyectan una sola vez)
+            self.demand_generation_model.to_crs(data_crs, model_crs)
 
         self.got_to_destination = 0
+        self.num_traveling = 0  # Commuters con `traveling` activo
         self.day = 0
         self.time = 0
 
         # Crear grafo de carreteras y asignar el destino común
-        self.graph, self.edge_weights = self.create_road_graph()
+        self.graph, self.edge_weights = self.create_road_graph(road_graph)
         self.space.set_road_graph(self.graph)  # Asignar el grafo a la ciudad
+        self.edge_lookup = EdgeLookup(self.graph, self.edge_weights)
+        self.congestion = None
+        if congestion:
+            self.congestion = CongestionModel.from_graph(self.graph, self.edge_weights, self.units_per_meter)
+        self.hazard = HazardMask(self.graph, self.edge_weights, self.vertices, edges=self.edge_lookup)
         self._select_random_points()
+        self.fire_front = None
+        self.edge_agents = EdgeAgentIndex()
+        if fire_spread_speed is not None:
+            self._ignite_fire_front(fire_spread_speed, num_fire_foci)
+        self.shelters = ShelterField(self.graph, self.hazard, self.vertices)
+        self.shelters.set_shelters(self.evacuation_centers, capacity=shelter_capacity)
         self.common_destination = self.get_random_road_point()
         if not self.common_destination:
             raise ValueError("No se pudo asignar un destino común. Verifica la red vial.")
         self._create_commuters()
-        self._create_agent_gdf()
+        self.agent_state = None
+        if columnar_state:
+            commuters = [agent for agent in self.schedule.agents if isinstance(agent, Commuter)]
+            # Con un `TrajectoryRecorder` el rastro de cada agente no se usa
+            trail_length = 0 if trajectory_recorder is not None else TRAIL_LENGTH
+            self.agent_state = CommuterState.from_commuters(commuters, trail_length)
+        self.osm.clear_layers()  # Las capas crudas de OSM ya no se necesitan
+        self.trajectory_recorder = trajectory_recorder
+        if trajectory_recorder is not None and self.agent_state is not None:
+            # Filas del estado columnar que se registran y sus índices densos en el registro
+            selected = [
+                (row, trajectory_recorder.agent_index(commuter.unique_id))
+                for row, commuter in enumerate(self.agent_state.commuters)
+                if trajectory_recorder.is_selected(commuter.unique_id)
+            ]
+            self._trajectory_rows = np.array([row for row, _ in selected], dtype=np.int64)
+            self._trajectory_agents = np.array([index for _, index in selected], dtype=np.int32)
         for agent in self.schedule.agents:
             if isinstance(agent, Commuter):
                 agent.state = "waiting"
                 # Asignar nuevos destinos o actividades
                 agent.new_destination = self.get_random_road_point()
+        # Los agentes dentro del radio inicial se notifican una vez
+        self._notify_agents_in_radius()
 
-        self.datacollector = mesa.DataCollector(
+        self.datacollector = MetricsCollector(
             model_reporters={
-                "Horas": lambda m: m.time // 60,  # De minutos a horas
+                "Horas": get_time_in_hours,  # De minutos a horas
                 "Agentes en Movimiento": lambda m: get_num_commuters_by_status(m, traveling=True),
                 "Agentes en Destino": get_got_to_destination,
             },
+            collect_every=metrics_every,
         )
-        self.datacollector.collect(self)
+        self.datacollector.collect(self, self.step_count)
 
     def _select_random_points(self):
-        # Lista de vértices disponibles en el grafo
-        nodes = list(self.space.road_graph.vertices())
-
-        # Convertir vértices a coordenadas
-        nodes_coords = [self.vertex_to_coord[node] for node in nodes]
-
         # Seleccionar un nodo aleatorio como foco de incendio
-        self.fire_focus = random.choice(nodes_coords)
+        self.fire_focus_vertex = self.vertices.random_vertex(self.random)
+        self.fire_focus = self.vertices.coord(self.fire_focus_vertex)
 
         # Filtrar nodos que estén a cierta distancia del foco de incendio
-        nodes_coords = [
-            coord for coord in nodes_coords
-            if Point(coord).distance(Point(self.fire_focus)) > 0.01  # Ajusta la distancia mínima
-        ]
-
-        # Seleccionar dos nodos diferentes como centros de evacuación
-        self.evacuation_centers = random.sample(nodes_coords, 2)
+        fire_x, fire_y = self.fire_focus
+        distances = np.hypot(self.vertices.x - fire_x, self.vertices.y - fire_y)
+        candidates = np.flatnonzero(distances > 1110 * self.units_per_meter).tolist()  # Ajusta la distancia mínima (~0.01°)
+
+        if self.evacuation_centers:
+            # Refugios entregados: se proyectan a su vértice más cercano de la red
+            shelter_vertices = self.vertices.index.nearest_many(self.evacuation_centers)
+        else:
+            # Seleccionar nodos diferentes como centros de evacuación
+            shelter_vertices = self.random.sample(candidates, self.num_evacuation_centers)
+        self.evacuation_centers = [self.vertices.coord(v) for v in shelter_vertices]
 
         #print(f"Foco de incendio: {self.fire_focus}")
         #print(f"Centros de evacuación: {self.evacuation_centers}")
@@ -147,59 +248,42 @@ class ZorZim(mesa.Model):
             unique_id="fire",
             model=self,
             geometry=Point(self.fire_focus),
-            crs=self.model_crs  # EPSG:4326
+            crs=self.model_crs
         )
         self.space.add_agent(fire_agent)
 
-        # Usar un CRS proyectado temporalmente para el buffer
-        transformer_to_projected = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-        transformer_to_geographic = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
-
-        # Transformar el foco de incendio a proyectado
-        fire_focus_projected = transform(
-            transformer_to_projected.transform,
-            Point(self.fire_focus)
-        )
-
-        # Crear el buffer en coordenadas proyectadas
-        fire_radius_projected = fire_focus_projected.buffer(self.fire_radius_value)
-
-        # Transformar el buffer de regreso a EPSG:4326
-        fire_radius_geographic = transform(
-            transformer_to_geographic.transform,
-            fire_radius_projected
-        )
-
-        # Crear el agente visual para el radio del fuego
+        # Crear el agente visual para el radio del fuego (el buffer se hace en el CRS del
+        # modelo; mesa-geo lo convierte a grados al dibujar el mapa)
         fire_radius_agent = FireRadiusAgent(
             unique_id="fire_radius",
             model=self,
-            geometry=fire_radius_geographic,
-            crs=self.model_crs,  # EPSG:4326
+            geometry=Point(self.fire_focus),
+            crs=self.model_crs,
             radius=self.fire_radius_value
         )
         self.space.add_agent(fire_radius_agent)
+        self.hazard.update(self.fire_focus, self.fire_radius_value)
 
         # Agregar los agentes para los centros de evacuación
         for i, center in enumerate(self.evacuation_centers):
             shelter_agent = MarkerAgent(
                 unique_id=f"shelter_{i}",
                 model=self,
-                geometry=Point(center),  # EPSG:4326
+                geometry=Point(center),
                 crs=self.model_crs
             )
             self.space.add_agent(shelter_agent)
 
     def _create_commuters(self) -> None:
         for i in range(self.num_commuters):
-            start_position = self.demand_generation_model.get_random_building()
+            start_position = self.demand_generation_model.get_random_building(self.random)
 
             # Asegurar que `start_position` sea válido
             if not start_position:
                 #print(f"Error: No se encontró una posición inicial válida para el agente {i}.")
                 continue
 
-            commuter_id = uuid.uuid4().int
+            commuter_id = self.next_id()  # Ids deterministas: las réplicas con la misma semilla se repiten
             
             # Crear el agente commuter
             commuter = Commuter(
@@ -222,10 +306,10 @@ class ZorZim(mesa.Model):
             self.space.add_commuter(commuter)
             self.schedule.add(commuter)
 
-    def _load_road_vertices_from_file(self, osm_object: OSM, city=None) -> None:
+    def _load_road_vertices_from_file(self, osm_object: OSMExtract, city=None) -> None:
         self.modal_split_model.fit(city=city, data_crs=self.data_crs, model_crs=self.model_crs, osm_object=osm_object)
-        self.walkway = WalkingNetwork(city=city, data_crs=self.data_crs, model_crs=self.model_crs, osm_object=osm_object)
-        self.driveway = DrivingNetwork(city=city, data_crs=self.data_crs, model_crs=self.model_crs, osm_object=osm_object)
+        self.walkway = osm_object.road_network("walking", city, self.data_crs, self.model_crs)
+        self.driveway = osm_object.road_network("driving", city, self.data_crs, self.model_crs)
 
     def plot_agent_paths_with_map(model, output_file="agent_paths_with_map.png"):
         """
@@ -233,194 +317,264 @@ class ZorZim(mesa.Model):
         :param model: Instancia del modelo ZorZim.
         :param output_file: Nombre del archivo donde se guardará la imagen.
         """
-        
-        fig, ax = plt.subplots(figsize=(10, 10))
-
-        # Dibujar las rutas de los agentes
-        for path in model.all_paths:
-            if len(path) > 1:
-                x_coords, y_coords = zip(*path)
-                ax.plot(x_coords, y_coords, linestyle="-", linewidth=1, alpha=0.7, color="blue")
-
-        # Dibujar el foco de incendio
-        if model.fire_focus:
-            fire_x, fire_y = model.fire_focus
-            ax.scatter(fire_x, fire_y, color="orange", s=100)
-
-        # Dibujar los centros de evacuación
-        for center in model.evacuation_centers:
-            center_x, center_y = center
-            ax.scatter(center_x, center_y, color="green", s=100)
-
-        # Agregar el fondo del mapa
-        xmin, xmax = ax.get_xlim()
-        ymin, ymax = ax.get_ylim()
-        ctx.add_basemap(ax, crs="EPSG:4326", source=ctx.providers.OpenStreetMap.Mapnik, zoom=15)
-
-        # Configuración del gráfico
-        ax.set_xlim(xmin, xmax)
-        ax.set_ylim(ymin, ymax)
-        ax.axis("off")  # Eliminar ejes para una visualización más limpia
-        plt.savefig(output_file, bbox_inches="tight", dpi=300)
-        plt.close()
+        plot_agent_paths_with_map(model.all_paths, model.fire_focus, model.evacuation_centers, output_file)
 
     def step(self):
         """Ejecución de un paso de simulación."""
+        profiler = self.profiler
+        if isinstance(self.schedule, EventScheduler) and self.skip_idle_steps:
+            self._skip_idle_steps()
         self.__update_clock()
         self.step_count += 1
+        profiler.begin_step(self.step_count)
 
-        # Actualizar todos los agentes
-        for agent in self.schedule.agents:
-            if isinstance(agent, Commuter):
-                agent.step()
+        if self.congestion is not None:
+            with profiler.phase("congestion"):
+                self._update_congestion()
 
-        # Guardar rutas de todos los agentes
-        self.all_paths = [
-            agent.path_trail for agent in self.schedule.agents if isinstance(agent, Commuter)
-        ]
+        # Actualizar todos los agentes
+        with profiler.phase("agents"):
+            if self.agent_state is not None:
+                moved = self.agent_state.step(self)
+                self.space.move_commuters(
+                    [self.agent_state.commuters[row] for row in moved],
+                    np.column_stack((self.agent_state.x[moved], self.agent_state.y[moved])),
+                )
+            elif isinstance(self.schedule, EventScheduler):
+                self.schedule.step()
+            else:
+                for agent in self.schedule.agents:
+                    if isinstance(agent, Commuter):
+                        agent.step()
+        with profiler.phase("move_commuters"):
+            # Geometrías e índice de mesa-geo, una vez por paso
+            profiler.count("agents_moved", self.space.flush_moves())
+        if self.trajectory_recorder is not None:
+            with profiler.phase("trajectories"):
+                self._record_trajectories()
+
+        if self.fire_front is not None:
+            with profiler.phase("fire_front"):
+                self._advance_fire_front()
 
         # Actualizar el radio de evacuación solo cada 'step_interval' pasos
         if self.step_count % self.step_interval == 0:
-            self._maybe_change_fire_radius()
+            with profiler.phase("fire_radius"):
+                self._maybe_change_fire_radius()
 
         # Verificar si todos los agentes que debían evacuar han terminado
-        agents_to_evacuate = [
-            agent for agent in self.schedule.agents
-            if isinstance(agent, Commuter) and agent.should_evacuate
-        ]
-
-        all_done = all(agent.has_reached_destination for agent in agents_to_evacuate)
+        if self.agent_state is not None:
+            all_done = self.agent_state.all_evacuated()
+        elif isinstance(self.schedule, EventScheduler):
+            all_done = self.schedule.pending_evacuations == 0
+        else:
+            agents_to_evacuate = [
+                agent for agent in self.schedule.agents
+                if isinstance(agent, Commuter) and agent.should_evacuate
+            ]
+            all_done = all(agent.has_reached_destination for agent in agents_to_evacuate)
 
         if all_done:
             print("Todos los agentes que debían evacuar han llegado a su destino. Deteniendo simulación.")
-            self.plot_agent_paths_with_map(output_file="agent_paths_with_map.png")
+            if self.trajectory_recorder is not None:
+                self.trajectory_recorder.flush()
+            if self.render_output is not None:
+                with profiler.phase("plot"):
+                    self._render_agent_paths()
             self.running = False
 
         # Recolectar datos al final del paso
-        self.datacollector.collect(self)
+        with profiler.phase("collect"):
+            # El último paso se registra siempre, aunque no calce con `collect_every`
+            self.datacollector.collect(self, self.step_count, force=not self.running)
+        profiler.end_step(self.step_count)
+        if not self.running:
+            profiler.close()
+
+    def _render_agent_paths(self):
+        """Envía el gráfico final de rutas a la etapa de renderizado (en segundo plano)."""
+        # Guardar rutas de todos los agentes (sólo se usan en el gráfico final)
+        if self.trajectory_recorder is not None:
+            self.all_paths = self.trajectory_recorder.paths()
+        else:
+            self.all_paths = [
+                list(agent.path_trail) for agent in self.schedule.agents if isinstance(agent, Commuter)
+            ]
+        if self.renderer is None:
+            self.renderer = RenderStage()
+        self.renderer.submit(
+            self.all_paths, self.fire_focus, self.evacuation_centers, self.render_output, crs=self.model_crs
+        )
 
-    def __update_clock(self):
-        self.time += 5  # Incrementa en 5 minutos por step
+    def _record_trajectories(self):
+        """Registra las posiciones y estados del paso actual en el `TrajectoryRecorder`."""
+        recorder = self.trajectory_recorder
+        if not recorder.should_record(self.step_count):
+            return
+        if self.agent_state is None:
+            recorder.record(self.step_count, [a for a in self.schedule.agents if isinstance(a, Commuter)])
+            return
+
+        state, rows = self.agent_state, self._trajectory_rows
+        status = np.select(
+            [state.reached[rows], state.should_evacuate[rows], ~np.isnan(state.evacuation_time[rows])],
+            [STATUS_ARRIVED, STATUS_EVACUATING, STATUS_WAITING],
+            default=STATUS_IDLE,
+        ).astype(np.int8)
+        recorder.record_arrays(self.step_count, self._trajectory_agents, state.x[rows], state.y[rows], status)
+
+    def __update_clock(self, steps=1):
+        self.time += 5 * steps  # Incrementa en 5 minutos por step
         if self.time >= 1440:  # 1440 minutos = 1 día
-            self.day += 1
-            self.time = 0
+            self.day += self.time // 1440
+            self.time %= 1440
+
+    def _skip_idle_steps(self):
+        """
+        Adelanta el reloj hasta el paso anterior al próximo evento, sin ejecutar los pasos
+        intermedios (en ellos no hay agentes que activar ni cambios del radio del fuego).
+        Los pasos saltados no quedan registrados en el `datacollector`.
+        """
+        next_radius_change = (self.step_count // self.step_interval + 1) * self.step_interval
+        target = next_radius_change
+        next_event = self.schedule.next_event_step()
+        if next_event is not None:
+            target = min(target, next_event)
+        if self.fire_front is not None and not self.fire_front.done:
+            # Paso en el que el frente de fuego alcanza el próximo vértice
+            minutes = self.fire_front.next_arrival - (self.day * 1440 + self.time)
+            target = min(target, self.step_count + max(1, int(np.ceil(minutes / 5))))
+        idle_steps = target - 1 - self.step_count
+        if idle_steps <= 0:
+            return
+        self.schedule.skip_to(self.step_count + idle_steps)
+        self.step_count += idle_steps
+        self.__update_clock(idle_steps)
 
     def get_random_road_point(self):
         """Selecciona un punto aleatorio en la red vial."""
-        if not self.coord_to_vertex:
+        if not len(self.vertices):
             raise ValueError("Error: El grafo de la red vial no tiene nodos disponibles.")
-        
-        random_vertex = random.choice(list(self.coord_to_vertex.values()))
-        for coord, vertex in self.coord_to_vertex.items():
-            if vertex == random_vertex:
-                return coord
-
-        raise ValueError("Error: No se pudo mapear el nodo aleatorio a coordenadas.")
-
-    def create_road_graph(self):
-        roads = self.osm.get_network(network_type="all")
-        G = Graph(directed=False)
-        edge_weights = G.new_edge_property("double")
-        self.coord_to_vertex = {}
-        self.vertex_to_coord = {}
-
-        for _, road in roads.iterrows():
-            geometry = road["geometry"]
-            if isinstance(geometry, MultiLineString):
-                for line in geometry.geoms:
-                    if len(line.coords) > 1:
-                        self._add_edges_to_graph(G, edge_weights, line.coords)
-            elif isinstance(geometry, LineString) and len(geometry.coords) > 1:
-                self._add_edges_to_graph(G, edge_weights, geometry.coords)
+
+        return self.vertices.coord(self.vertices.random_vertex(self.random))
+
+    def create_road_graph(self, road_graph=None):
+        """Grafo vial del modelo; `road_graph` permite reutilizar uno ya cargado con `load_road_graph`."""
+        if road_graph is None:
+            road_graph = load_road_graph(self.osm, self.data_crs, self.model_crs)
+        G, edge_weights, self.vertices = road_graph
 
         #print(f"Número de nodos en el grafo: {G.num_vertices()}")
         #print(f"Número de conexiones en el grafo: {G.num_edges()}")
-
-        self.vertex_to_coord = {v: coord for coord, v in self.coord_to_vertex.items()}
         return G, edge_weights
 
-    def _add_edges_to_graph(self, G, edge_weights, coords):
-        for i in range(len(coords) - 1):
-            start, end = coords[i], coords[i + 1]
-            if start not in self.coord_to_vertex:
-                self.coord_to_vertex[start] = G.add_vertex()
-            if end not in self.coord_to_vertex:
-                self.coord_to_vertex[end] = G.add_vertex()
-            v_start = self.coord_to_vertex[start]
-            v_end = self.coord_to_vertex[end]
-            edge = G.add_edge(v_start, v_end)
-            edge_weights[edge] = Point(start).distance(Point(end))
-
     def get_shortest_path(self, origin, destination):
-        """Calcula el camino más corto y evita rutas que pasen por el nodo de fuego."""
+        """Calcula el camino más corto evitando la zona dentro del radio del fuego."""
+        with self.profiler.phase("routing"):
+            return self._get_shortest_path(origin, destination)
+
+    def _get_shortest_path(self, origin, destination):
         if not self.validate_position_in_network(origin) or not self.validate_position_in_network(destination):
             return []
 
         try:
             origin_vertex = self._get_closest_vertex(origin)
-            destination_vertex = self._get_closest_vertex(destination)
-
-            # Calcular el camino más corto normal
-            path = shortest_path(self.graph, source=origin_vertex, target=destination_vertex, weights=self.edge_weights)[0]
-
-            # Si no hay foco de incendio, devuelve la ruta directamente
-            if not self.fire_focus:
-                return path
 
-            # Verificar si el camino incluye el nodo del fuego
-            fire_vertex = self._get_closest_vertex(self.fire_focus)
-            if fire_vertex in path:
-                #print(f"Evadiendo nodo de fuego para la ruta desde {origin} a {destination}.")
-                # Crear un subgrafo excluyendo el nodo del fuego
-                subgraph = Graph(self.graph, prune=True)  # Crea un subgrafo
-                subgraph.remove_vertex(fire_vertex)       # Elimina el nodo del fuego
+            # Las rutas hacia el refugio más cercano se leen del campo de distancias
+            if destination in self.shelters and self.shelters.nearest_shelter(origin_vertex) == destination:
+                self.profiler.count("shelter_field_routes")
+                return self.shelters.path(origin_vertex)
 
-                # Recalcular la ruta en el subgrafo
-                path = shortest_path(subgraph, source=origin_vertex, target=destination_vertex, weights=self.edge_weights)[0]
+            destination_vertex = self._get_closest_vertex(destination)
 
-            return path
-        except Exception as e:
-            #print(f"Error calculando la ruta más corta: {e}")
+            route = self.route_cache.get(origin_vertex, destination_vertex)
+            if route is None:
+                # Los pesos de la máscara de peligro penalizan las aristas dentro del radio
+                # del fuego, por lo que no es necesario copiar el grafo para evitarlas
+                self.profiler.count("routes_computed")
+                path = shortest_path(self.graph, source=origin_vertex, target=destination_vertex, weights=self.hazard.weights)[0]
+                route = [int(v) for v in path]
+                self.route_cache.put(origin_vertex, destination_vertex, route)
+                return route
+            self.profiler.count("route_cache_hits")
+            return route.tolist()
+        except Exception:
+            # Una ruta que no se puede calcular se trata como inalcanzable
             return []
 
+    def get_shortest_paths(self, origins, destinations, processes=None):
+        """
+        Versión por lotes de `get_shortest_path`: devuelve una ruta (ids de vértice) por
+        cada par origen-destino. Las rutas al refugio más cercano se leen del campo de
+        distancias de los refugios y el resto se agrupa por origen y se calcula con
+        búsquedas uno-a-muchos, en paralelo si el lote es grande.
+        """
+        self.profiler.count("vertex_snaps", 2 * len(origins))
+        origin_vertices, origin_distances = self.vertices.index.nearest_many(origins, return_distance=True)
+        destination_vertices, destination_distances = self.vertices.index.nearest_many(destinations, return_distance=True)
+        # Mismo criterio que `validate_position_in_network`
+        valid = (origin_distances <= 100) & (destination_distances <= 100)
+
+        routes = [[] for _ in range(len(origin_vertices))]
+        pending = []
+        for i, destination in enumerate(destinations):
+            if not valid[i]:
+                continue
+            destination = tuple(destination)
+            if destination in self.shelters and self.shelters.nearest_shelter(origin_vertices[i]) == destination:
+                self.profiler.count("shelter_field_routes")
+                routes[i] = self.shelters.path(origin_vertices[i])
+                continue
+            route = self.route_cache.get(origin_vertices[i], destination_vertices[i])
+            if route is None:
+                pending.append(i)
+            else:
+                self.profiler.count("route_cache_hits")
+                routes[i] = route.tolist()
+
+        if pending:
+            self.profiler.count("routes_computed", len(pending))
+            computed = batch_routes(
+                self.graph, self.hazard.weights, origin_vertices[pending], destination_vertices[pending], processes=processes
+            )
+            for i, route in zip(pending, computed):
+                self.route_cache.put(origin_vertices[i], destination_vertices[i], route)
+                routes[i] = route.tolist()
+        return routes
+
     def validate_position_in_network(self, position):
-        if not self.coord_to_vertex:
-            raise ValueError("El diccionario coord_to_vertex está vacío.")
-        closest_vertex = self._get_closest_vertex(position)
-        closest_coord = [coord for coord, vertex in self.coord_to_vertex.items() if vertex == closest_vertex]
-        return closest_coord and Point(position).distance(Point(closest_coord[0])) <= 100
+        if not len(self.vertices):
+            raise ValueError("El almacén de vértices está vacío.")
+        _, distance = self.vertices.index.nearest_with_distance(position)
+        return distance <= 100
 
     def _get_closest_vertex(self, position):
-        return min(
-            self.coord_to_vertex.values(),
-            key=lambda v: Point(position).distance(
-                Point(list(self.coord_to_vertex.keys())[list(self.coord_to_vertex.values()).index(v)])
-            ),
-        )
+        self.profiler.count("vertex_snaps")
+        return self.graph.vertex(self.vertices.index.nearest(position))
+
+    def _get_closest_vertices(self, positions):
+        """Versión por lotes de `_get_closest_vertex`: devuelve los índices de vértice."""
+        self.profiler.count("vertex_snaps", len(positions))
+        return self.vertices.index.nearest_many(positions)
+
+    def _get_vertices_within(self, position, radius):
+        """Índices de los vértices a distancia `radius` (en unidades del CRS) de `position`."""
+        return self.vertices.index.within(position, radius)
     
     def get_random_building(self):
         if not self.building_coords:
             raise ValueError("Error: No hay coordenadas de edificios disponibles.")
-        return random.choice(self.building_coords)
-
-    def _create_agent_gdf(self):
-        """Crea un GeoDataFrame para los agentes con un índice espacial."""
-        agent_data = [
-            {"geometry": Point(agent.pos), "agent": agent}
-            for agent in self.schedule.agents if isinstance(agent, Commuter)
-        ]
-        self.agent_gdf = gpd.GeoDataFrame(agent_data, crs="EPSG:4326")  # Ajusta el CRS según tu modelo
-        self.agent_gdf.sindex  # Crea índice espacial
+        return self.random.choice(self.building_coords)
 
     def _maybe_change_fire_radius(self):
         """Decide si cambiar el radio de evacuación."""
-        if random.random() < self.change_probability:
+        if self.random.random() < self.change_probability:
             # Define las probabilidades para disminuir, aumentar o quedarse igual
             changes = [-self.radius_change_amount, self.radius_change_amount, 0]
             probabilities = [0.2, 0.3, 0.5]  # reduce, aumenta, igual 
             
             # Selecciona el cambio basado en las probabilidades
-            change = random.choices(changes, probabilities, k=1)[0]
+            change = self.random.choices(changes, probabilities, k=1)[0]
             new_radius = self.fire_radius_value + change
 
             # Limitar el radio dentro del rango [min_radius, max_radius]
@@ -437,36 +591,145 @@ class ZorZim(mesa.Model):
                     self._notify_agents_in_radius()
 
     def _update_fire_radius(self):
-        """Actualiza la geometría del agente del radio de evacuación."""
+        """Actualiza la geometría del agente del radio de evacuación y la máscara de peligro."""
+        if self.hazard.update(self.fire_focus, self.fire_radius_value):
+            self.route_cache.clear()
         for agent in self.space.agents:
             if isinstance(agent, FireRadiusAgent):
                 # Crear un nuevo buffer con el radio actualizado
                 agent.geometry = Point(self.fire_focus).buffer(self.fire_radius_value)
-                print(f"Radio de evacuación actualizado a: {self.fire_radius_value} (grados)")
+                logger.debug("Radio de evacuación actualizado a: %.0f m", self.fire_radius_value / self.units_per_meter)
                 break
 
-    def _update_agent_gdf(self):
-        """Actualiza el GeoDataFrame con las posiciones actuales de los agentes."""
-        self.agent_gdf["geometry"] = [
-            Point(agent.pos) for agent in self.schedule.agents if isinstance(agent, Commuter)
-        ]
-        self.agent_gdf.sindex  # Actualizar el índice espacial
+    def _ignite_fire_front(self, spread_speed, num_foci):
+        """
+        Crea el frente de fuego que se propaga por la red desde el foco (y `num_foci - 1`
+        focos adicionales elegidos al azar) a `spread_speed` metros por minuto.
+        """
+        foci = [self.fire_focus_vertex]
+        foci += [self.vertices.random_vertex(self.random) for _ in range(num_foci - 1)]
+        matrix = EdgeMatrix(self.graph, self.edge_weights.a)
+        self.fire_front = FireFront(matrix, spread_speed * self.units_per_meter)
+        self.fire_front.ignite(foci, self.day * 1440 + self.time)
+
+    def register_path(self, agent, vertices):
+        """
+        Registra las aristas de la ruta de `agent` (ids de vértice) para el reruteo por el
+        fuego y para la congestión. Una ruta vacía borra el registro anterior.
+        """
+        if self.fire_front is None and self.congestion is None:
+            return
+        edges = self.edge_lookup.path_edges(vertices)
+        if self.fire_front is not None:
+            if len(edges):
+                self.edge_agents.register(agent, edges)
+            else:
+                self.edge_agents.unregister(agent)
+        if self.congestion is not None:
+            if self.agent_state is not None:
+                self.agent_state.set_path_edges(agent._row, edges)
+            else:
+                agent.path_edge_ids = edges
+
+    def _update_congestion(self):
+        """Ocupación y velocidad de cada arista según la arista actual de los agentes en viaje."""
+        if self.agent_state is not None:
+            state = self.agent_state
+            rows = np.flatnonzero(state.should_evacuate & state.traveling & (state.path_length > 0))
+            edges = state.current_edges(rows)
+        else:
+            edges = np.fromiter(
+                (
+                    agent._current_edge() for agent in self.schedule.agents
+                    if isinstance(agent, Commuter) and agent.should_evacuate and agent.traveling
+                ),
+                dtype=np.int64,
+            )
+        self.congestion.update(edges)
+
+    def _advance_fire_front(self):
+        """
+        Cierra las aristas alcanzadas por el frente de fuego y recalcula la ruta sólo de
+        los agentes cuya ruta pendiente cruza alguna de ellas.
+        """
+        burned = self.fire_front.advance(self.day * 1440 + self.time)
+        if not len(burned):
+            return
+        closed = self.hazard.block_vertices(burned)
+        if not len(closed):
+            return
+        self.route_cache.clear()
+        for agent in self.edge_agents.agents_crossing(closed):
+            agent.step_in_path = 0
+            # Ruta directa al destino: un reruteo por peligro no toma desviaciones al azar
+            agent._select_shortest_path()
+            self.profiler.count("agents_rerouted")
+            if isinstance(self.schedule, EventScheduler):
+                self.schedule.refresh(agent)
+
+    def assign_shelter(self, agent):
+        """
+        Refugio más cercano por la red (con cupo, si los refugios tienen capacidad) a la
+        posición de `agent`. Si no alcanza ninguno, se elige uno al azar.
+        """
+        shelter = self.shelters.assign(self._get_closest_vertex(agent.pos))
+        if shelter is None:
+            shelter = self.random.choice(self.evacuation_centers)
+        return shelter
+
+    def start_evacuation(self, agents):
+        """
+        Hace evacuar a `agents` a la vez: a cada uno se le asigna su refugio y las rutas
+        directas (las que no toman una desviación) se calculan con una sola llamada a
+        `get_shortest_paths`.
+        """
+        pending = []
+        for agent in agents:
+            agent.should_evacuate = True
+            agent._assign_evacuation_center(pending)
+        if not pending:
+            return
+
+        with self.profiler.phase("routing"):
+            routes = self.get_shortest_paths(
+                [agent.pos for agent in pending], [agent.destination for agent in pending]
+            )
+        for agent, route in zip(pending, routes):
+            agent._select_shortest_path(route)
 
     def _notify_agents_in_radius(self):
-        """Notifica a los agentes dentro del nuevo radio de evacuación."""
-        fire_point = Point(self.fire_focus)
-
-        possible_matches_index = list(self.agent_gdf.sindex.intersection(fire_point.buffer(self.fire_radius_value).bounds))
-        possible_matches = self.agent_gdf.iloc[possible_matches_index]
-
-        for _, row in possible_matches.iterrows():
-            agent = row["agent"]
-            agent_point = Point(agent.pos)
-            if agent_point.distance(fire_point) <= self.fire_radius_value:
-                print(f"Agente {agent.unique_id} está dentro del nuevo radio de evacuación.")
-                
-                # Recalcular el tiempo de evacuación
-                agent.evacuation_time = agent._calculate_evacuation_time()
-
-                # Forzar al agente a reevaluar su decisión de evacuación
-                agent._check_proximity_to_fire()
+        """
+        Notifica a los agentes que quedaron dentro del radio de evacuación y todavía no
+        evacúan ni llegaron a destino. La primera llamada notifica el disco completo; las
+        siguientes, sólo el anillo más allá del mayor radio ya notificado, así que un radio
+        que se achica y vuelve a crecer no notifica dos veces a los mismos agentes.
+        """
+        if self._notified_radius is not None and self.fire_radius_value <= self._notified_radius:
+            return
+        # El índice de grilla de la ciudad se mantiene al día con cada movimiento
+        if self._notified_radius is None:
+            candidates = self.space.get_commuters_within(self.fire_focus, self.fire_radius_value)
+        else:
+            candidates = self.space.get_commuters_in_ring(self.fire_focus, self._notified_radius, self.fire_radius_value)
+        self._notified_radius = self.fire_radius_value
+        agents = [
+            agent for agent in candidates if not agent.should_evacuate and not agent.has_reached_destination
+        ]
+        if not agents:
+            return
+
+        # Recalcular el tiempo de evacuación de todos a la vez
+        times = evacuation_times(self.random, len(agents))
+        if self.agent_state is not None:
+            rows = np.array([agent._row for agent in agents], dtype=np.int64)
+            self.agent_state.evacuation_time[rows] = times
+        else:
+            for agent, minutes in zip(agents, times.tolist()):
+                agent.evacuation_time = None if np.isnan(minutes) else minutes
+
+        # Están dentro del radio: evacúan ya quienes no tienen tiempo diferido (equivale a
+        # `_check_proximity_to_fire`, que sólo requiere trabajo por agente para el ruteo)
+        self.start_evacuation([agent for agent, minutes in zip(agents, times.tolist()) if np.isnan(minutes)])
+        if isinstance(self.schedule, EventScheduler):
+            for agent in agents:
+                self.schedule.refresh(agent)
@@ -0,0 +1,140 @@
+'''
+Instrumentación de `ZorZim.step`: tiempos por fase, contadores y cProfile opcional.
+'''
+from __future__ import annotations
+import contextlib
+import cProfile
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import DefaultDict, Dict, Iterator, Optional, Tuple
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class PhaseTimer:
+    """Tiempo acumulado, número de llamadas y máximo de una fase."""
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"calls": self.calls, "total_seconds": self.total, "max_seconds": self.max}
+
+
+class StepProfiler:
+    """
+    Mide cuánto tiempo se gasta en cada fase de la simulación (`phase`) y cuenta eventos
+    (`count`), como rutas calculadas, aciertos de caché, proyecciones a vértices o
+    agentes movidos. Con `enabled=False` ambas operaciones no hacen nada.
+
+    Con `cprofile_steps=(inicio, fin)` además se ejecuta cProfile entre esos pasos
+    (ambos incluidos) y las estadísticas se guardan en `cprofile_output`.
+    Los resultados se exportan como JSON (`to_json`) o en el formato de texto de
+    Prometheus (`to_prometheus`).
+    """
+    enabled: bool
+    phases: DefaultDict[str, PhaseTimer]
+    counters: DefaultDict[str, int]
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        cprofile_steps: Optional[Tuple[int, int]] = None,
+        cprofile_output: Optional[Path] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.phases = defaultdict(PhaseTimer)
+        self.counters = defaultdict(int)
+        self.cprofile_steps = cprofile_steps
+        self.cprofile_output = Path(cprofile_output) if cprofile_output is not None else None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self.steps = 0
+
+    @contextlib.contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name].add(time.perf_counter() - start)
+
+    def phase(self, name: str):
+        """Contexto que acumula el tiempo transcurrido en la fase `name`."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed(name)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += amount
+
+    def begin_step(self, step: int) -> None:
+        if not self.enabled:
+            return
+        if self.cprofile_steps is not None and step == self.cprofile_steps[0]:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def end_step(self, step: int) -> None:
+        if not self.enabled:
+            return
+        self.steps += 1
+        if self._cprofile is not None and step >= self.cprofile_steps[1]:
+            self._stop_cprofile()
+
+    def _stop_cprofile(self) -> None:
+        self._cprofile.disable()
+        if self.cprofile_output is not None:
+            self.cprofile_output.parent.mkdir(parents=True, exist_ok=True)
+            self._cprofile.dump_stats(str(self.cprofile_output))
+        self._cprofile = None
+
+    def close(self) -> None:
+        """Detiene cProfile si la simulación terminó antes del final del rango pedido."""
+        if self._cprofile is not None:
+            self._stop_cprofile()
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "steps": self.steps,
+            "phases": {name: timer.as_dict() for name, timer in sorted(self.phases.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.as_dict(), indent=2))
+
+    def to_prometheus(self, path: Path, prefix: str = "zorzim") -> None:
+        lines = [
+            f"# TYPE {prefix}_steps_total counter",
+            f"{prefix}_steps_total {self.steps}",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{name}"}} {timer.total}' for name, timer in sorted(self.phases.items())]
+        lines.append(f"# TYPE {prefix}_phase_calls_total counter")
+        lines += [f'{prefix}_phase_calls_total{{phase="{name}"}} {timer.calls}' for name, timer in sorted(self.phases.items())]
+        lines.append(f"# TYPE {prefix}_phase_max_seconds gauge")
+        lines += [f'{prefix}_phase_max_seconds{{phase="{name}"}} {timer.max}' for name, timer in sorted(self.phases.items())]
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        lines += [f'{prefix}_events_total{{event="{name}"}} {value}' for name, value in sorted(self.counters.items())]
+        Path(path).write_text("\n".join(lines) + "\n")
+
+    def export(self, path: Path) -> None:
+        """Exporta en formato Prometheus si `path` termina en `.prom`, y en JSON en otro caso."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            self.to_prometheus(path)
+        else:
+            self.to_json(path)
@@ -0,0 +1,80 @@
+'''
+Réplicas Monte Carlo del modelo en paralelo, compartiendo la red vial entre procesos.
+'''
+from __future__ import annotations
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from zorzim.space.parallel import can_fork, fork_map, shared
+
+MAX_STEPS = 288  # Un día simulado con pasos de 5 minutos
+
+def replication_summary(model) -> Dict[str, float]:
+    """Métricas finales de una réplica, leídas de los contadores del modelo."""
+    if model.agent_state is not None:
+        should_evacuate = int(model.agent_state.should_evacuate.sum())
+    else:
+        should_evacuate = sum(1 for agent in model.schedule.agents if agent.should_evacuate)
+    return {
+        "steps": model.step_count,
+        "finished": not model.running,
+        "simulated_minutes": model.day * 1440 + model.time,
+        "commuters": model.schedule.get_agent_count(),
+        "should_evacuate": should_evacuate,
+        "got_to_destination": model.got_to_destination,
+        "still_traveling": model.num_traveling,
+        "final_fire_radius": model.fire_radius_value,
+    }
+
+
+def run_replication(task: Tuple[int, int, Dict, int], model_factory: Optional[Callable] = None) -> Dict[str, float]:
+    """
+    Ejecuta una réplica: construye el modelo con su semilla y lo avanza hasta terminar.
+    Sin `model_factory` usa la fábrica compartida con el pool (ver `fork_map`).
+    """
+    replication, seed, params, max_steps = task
+    start = time.perf_counter()
+    factory = model_factory if model_factory is not None else shared()
+    model = factory(seed=seed, **params)
+    while model.running and model.step_count < max_steps:
+        model.step()
+    summary = replication_summary(model)
+    summary.update({"replication": replication, "seed": seed, "wall_seconds": time.perf_counter() - start})
+    summary.update({f"param_{name}": value for name, value in params.items()})
+    return summary
+
+
+def run_replications(
+    model_factory: Callable,
+    replications: int,
+    base_seed: int = 0,
+    max_steps: int = MAX_STEPS,
+    sweep: Optional[Sequence[Dict]] = None,
+    processes: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Ejecuta `replications` réplicas por cada combinación de parámetros de `sweep` y
+    devuelve una tabla con una fila de métricas por réplica.
+
+    `model_factory(seed=..., **parametros)` debe construir un `ZorZim` que reutilice una
+    red vial ya cargada (ver `load_road_graph`): la fábrica se comparte con los procesos
+    hijos por fork, así que la red se construye una sola vez y se comparte por
+    copy-on-write. La réplica `i` usa la semilla `base_seed + i`, por lo que los resultados
+    no dependen del número de procesos.
+    """
+    sweep = list(sweep) if sweep else [{}]
+    tasks: List[Tuple[int, int, Dict, int]] = []
+    for params in sweep:
+        for replication in range(replications):
+            tasks.append((len(tasks), base_seed + replication, params, max_steps))
+
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(tasks) > 1 and can_fork():
+        # Réplicas de a una: su duración varía mucho según cuántos agentes evacuan
+        results = fork_map(run_replication, tasks, model_factory, min(processes, len(tasks)), chunksize=1)
+    else:
+        results = [run_replication(task, model_factory) for task in tasks]
+    return pd.DataFrame(results).set_index("replication")
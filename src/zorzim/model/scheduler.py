@@ -0,0 +1,142 @@
+'''
+Planificador por eventos para los commuters.
+
+La mayoría de los commuters sólo está esperando que se agote su `evacuation_time` o nunca
+va a evacuar. En vez de activarlos en cada paso, este planificador los duerme en una cola
+de prioridad con el paso en que deben despertar, y en cada paso sólo activa a los
+viajeros que están evacuando.
+'''
+from __future__ import annotations
+import heapq
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+import mesa
+
+
+class EventScheduler(mesa.time.BaseScheduler):
+    """
+    Alternativa a `mesa.time.RandomActivation` que sólo activa a los agentes con algo que
+    hacer en el paso actual.
+
+    Cada agente queda clasificado en uno de estos grupos (ver `refresh`):
+
+    - viajeros: deben evacuar y avanzan por su ruta; se activan en orden aleatorio en cada paso.
+    - durmientes: esperan a que se agote su `evacuation_time`; se despiertan con un evento en
+      la cola de prioridad en el paso exacto en que el contador llegaría a cero.
+    - inactivos: no evacuan (o ya llegaron, o quedaron sin ruta) y no se activan.
+
+    Los agentes que deben evacuar y aún no llegan se cuentan aparte, de modo que la condición
+    de término (`pending_evacuations == 0`) se consulta en O(1). Un agente durmiente no
+    registra su rastro mientras duerme, y su `evacuation_time` se actualiza al despertar.
+
+    Todo cambio de estado hecho fuera de `Commuter.step` (por ejemplo al notificar a los
+    agentes dentro del radio del fuego) debe informarse con `refresh(agent)`.
+    """
+    minutes_per_step: float
+    _travelers: Dict[int, mesa.Agent]
+    _pending: Set[int]
+    _wake_queue: List[Tuple[int, int, int]]
+    _wake_info: Dict[int, Tuple[int, int, float]]
+
+    def __init__(self, model: mesa.Model, minutes_per_step: float) -> None:
+        super().__init__(model)
+        self.minutes_per_step = minutes_per_step
+        self._travelers = {}
+        self._pending = set()
+        self._wake_queue = []
+        # unique_id -> (paso de despertar, paso de referencia, tiempo restante en ese paso)
+        self._wake_info = {}
+        self._sequence = 0
+
+    def add(self, agent: mesa.Agent) -> None:
+        super().add(agent)
+        self.refresh(agent)
+
+    def remove(self, agent: mesa.Agent) -> None:
+        super().remove(agent)
+        self._forget(agent.unique_id)
+
+    def _forget(self, unique_id: int) -> Optional[Tuple[int, int, float]]:
+        self._travelers.pop(unique_id, None)
+        self._pending.discard(unique_id)
+        return self._wake_info.pop(unique_id, None)  # El evento queda obsoleto en la cola
+
+    @property
+    def pending_evacuations(self) -> int:
+        """Agentes que deben evacuar y todavía no llegan a su destino."""
+        return len(self._pending)
+
+    @property
+    def num_travelers(self) -> int:
+        return len(self._travelers)
+
+    def refresh(self, agent: mesa.Agent) -> None:
+        """
+        Reclasifica a `agent` según su estado actual. Un agente con `evacuation_time` se
+        vuelve a dormir con ese tiempo contado desde el paso actual, así que sólo debe
+        llamarse tras reiniciar su contador (mientras duerme, `evacuation_time` conserva
+        el valor con que se durmió).
+        """
+        unique_id = agent.unique_id
+        self._forget(unique_id)
+
+        if agent.should_evacuate:
+            if agent.has_reached_destination:
+                return
+            self._pending.add(unique_id)
+            # Sin ruta `_move` no hace nada: el agente sigue pendiente, pero no se activa
+            if agent.traveling and agent.my_path:
+                self._travelers[unique_id] = agent
+        elif agent.evacuation_time is not None:
+            remaining = agent.evacuation_time
+            # Paso en que `Commuter.step` llevaría el contador a cero o menos
+            wake = self.steps + max(1, math.ceil(remaining / self.minutes_per_step))
+            self._wake_info[unique_id] = (wake, self.steps, remaining)
+            self._sequence += 1
+            heapq.heappush(self._wake_queue, (wake, self._sequence, unique_id))
+
+    def next_event_step(self) -> Optional[int]:
+        """Próximo paso con algún agente que activar, o None si no queda ninguno."""
+        if self._travelers:
+            return self.steps + 1
+        while self._wake_queue:
+            wake, _, unique_id = self._wake_queue[0]
+            info = self._wake_info.get(unique_id)
+            if info is not None and info[0] == wake:
+                return wake
+            heapq.heappop(self._wake_queue)  # Evento obsoleto
+        return None
+
+    def skip_to(self, step: int) -> None:
+        """Adelanta el reloj hasta `step` sin activar a nadie (no debe haber eventos antes)."""
+        next_event = self.next_event_step()
+        if next_event is not None and step >= next_event:
+            raise ValueError(f"No se puede saltar al paso {step}: hay eventos en el paso {next_event}.")
+        skipped = max(0, step - self.steps)
+        self.steps += skipped
+        self.time += skipped
+
+    def _due_agents(self, step: int) -> List[mesa.Agent]:
+        due = []
+        while self._wake_queue and self._wake_queue[0][0] <= step:
+            wake, _, unique_id = heapq.heappop(self._wake_queue)
+            info = self._wake_info.get(unique_id)
+            if info is None or info[0] != wake:
+                continue
+            del self._wake_info[unique_id]
+            _, since, remaining = info
+            agent = self._agents[unique_id]
+            # Deja el contador como si el agente se hubiera activado en cada paso dormido
+            agent.evacuation_time = remaining - (step - 1 - since) * self.minutes_per_step
+            due.append(agent)
+        return due
+
+    def step(self) -> None:
+        self.steps += 1
+        self.time += 1
+        agents = self._due_agents(self.steps) + list(self._travelers.values())
+        self.model.random.shuffle(agents)
+        for agent in agents:
+            agent.step()
+            self.refresh(agent)
@@ -0,0 +1,177 @@
+'''
+Registro columnar de trayectorias de los commuters, con volcado por bloques a disco.
+'''
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Códigos de estado guardados en la columna `status`
+STATUS_IDLE = 0        # No evacua
+STATUS_WAITING = 1     # Espera que se agote su tiempo de evacuación
+STATUS_EVACUATING = 2  # Evacuando hacia su destino
+STATUS_ARRIVED = 3     # Llegó a su destino
+STATUS_NAMES = ("idle", "waiting", "evacuating", "arrived")
+
+CHUNK_DTYPE = np.dtype([
+    ("step", np.int32),
+    ("agent", np.int32),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("status", np.int8),
+])
+
+
+def commuter_status(commuter) -> int:
+    if commuter.has_reached_destination:
+        return STATUS_ARRIVED
+    if commuter.should_evacuate:
+        return STATUS_EVACUATING
+    if commuter.evacuation_time is not None:
+        return STATUS_WAITING
+    return STATUS_IDLE
+
+
+class TrajectoryRecorder:
+    """
+    Guarda filas (paso, agente, x, y, estado) en bloques preasignados de `chunk_size`
+    filas. Cada bloque lleno se escribe en `output_dir` como `chunk_00000.npz` (o
+    `.parquet`), de modo que la memoria usada no crece con el largo de la simulación. Sin
+    `output_dir` los bloques llenos se conservan en memoria.
+
+    Los agentes se identifican con un índice denso (`agent`), asignado en el orden en que
+    se registran; `agent_ids.npz` guarda la correspondencia con sus `unique_id`.
+    Con `sample_every=k` sólo se registra uno de cada k pasos, y con `agent_ids` sólo los
+    agentes indicados.
+    """
+    output_dir: Optional[Path]
+    chunk_size: int
+    sample_every: int
+    fmt: str
+
+    def __init__(
+        self,
+        output_dir: Optional[Path] = None,
+        chunk_size: int = 65536,
+        sample_every: int = 1,
+        agent_ids: Optional[Iterable[int]] = None,
+        fmt: str = "npz",
+    ) -> None:
+        if fmt not in ("npz", "parquet"):
+            raise ValueError(f"Formato de trayectorias no soportado: {fmt}")
+        if sample_every < 1:
+            raise ValueError("sample_every debe ser al menos 1.")
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.chunk_size = chunk_size
+        self.sample_every = sample_every
+        self.fmt = fmt
+        self._selected = set(agent_ids) if agent_ids is not None else None
+        self._agent_index: Dict[int, int] = {}
+        self._buffer = np.empty(chunk_size, dtype=CHUNK_DTYPE)
+        self._used = 0
+        self._chunks: List[np.ndarray] = []  # Bloques en memoria (sin `output_dir`)
+        self._files: List[Path] = []
+        self.rows_written = 0
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def should_record(self, step: int) -> bool:
+        return step % self.sample_every == 0
+
+    def is_selected(self, unique_id: int) -> bool:
+        return self._selected is None or unique_id in self._selected
+
+    def agent_index(self, unique_id: int) -> int:
+        """Índice denso del agente `unique_id`, asignándole uno nuevo si no lo tenía."""
+        index = self._agent_index.get(unique_id)
+        if index is None:
+            index = self._agent_index[unique_id] = len(self._agent_index)
+        return index
+
+    def record(self, step: int, commuters: Sequence) -> None:
+        """Registra la posición y estado actuales de `commuters` en el paso `step`."""
+        if not self.should_record(step):
+            return
+        commuters = [c for c in commuters if c.pos is not None and self.is_selected(c.unique_id)]
+        if not commuters:
+            return
+        positions = np.array([c.pos for c in commuters], dtype=np.float64)
+        self.record_arrays(
+            step,
+            np.array([self.agent_index(c.unique_id) for c in commuters], dtype=np.int32),
+            positions[:, 0],
+            positions[:, 1],
+            np.array([commuter_status(c) for c in commuters], dtype=np.int8),
+        )
+
+    def record_arrays(
+        self, step: int, agents: np.ndarray, x: np.ndarray, y: np.ndarray, status: np.ndarray
+    ) -> None:
+        """Versión por columnas de `record`; `agents` son índices densos (ver `agent_index`)."""
+        offset = 0
+        total = len(agents)
+        while offset < total:
+            n = min(total - offset, self.chunk_size - self._used)
+            rows = self._buffer[self._used:self._used + n]
+            rows["step"] = step
+            rows["agent"] = agents[offset:offset + n]
+            rows["x"] = x[offset:offset + n]
+            rows["y"] = y[offset:offset + n]
+            rows["status"] = status[offset:offset + n]
+            self._used += n
+            offset += n
+            if self._used == self.chunk_size:
+                self._flush_chunk()
+
+    def _flush_chunk(self) -> None:
+        if not self._used:
+            return
+        chunk = self._buffer[:self._used].copy()
+        self.rows_written += self._used
+        self._used = 0
+        if self.output_dir is None:
+            self._chunks.append(chunk)
+            return
+        path = self.output_dir / f"chunk_{len(self._files):05d}.{self.fmt}"
+        if self.fmt == "parquet":
+            pd.DataFrame(chunk).to_parquet(path, index=False)
+        else:
+            np.savez(path, **{name: chunk[name] for name in CHUNK_DTYPE.names})
+        self._files.append(path)
+
+    def flush(self) -> None:
+        """Escribe el bloque parcial actual y la tabla de identificadores de agentes."""
+        self._flush_chunk()
+        if self.output_dir is not None:
+            unique_ids = np.array([str(unique_id) for unique_id in self._agent_index])
+            np.savez(self.output_dir / "agent_ids.npz", unique_id=unique_ids)
+
+    def _load_chunk(self, path: Path) -> np.ndarray:
+        if self.fmt == "parquet":
+            frame = pd.read_parquet(path)
+            chunk = np.empty(len(frame), dtype=CHUNK_DTYPE)
+            for name in CHUNK_DTYPE.names:
+                chunk[name] = frame[name].to_numpy()
+            return chunk
+        with np.load(path) as data:
+            chunk = np.empty(len(data["step"]), dtype=CHUNK_DTYPE)
+            for name in CHUNK_DTYPE.names:
+                chunk[name] = data[name]
+        return chunk
+
+    def to_array(self) -> np.ndarray:
+        """Todas las filas registradas (bloques en disco, en memoria y el bloque parcial)."""
+        chunks = [self._load_chunk(path) for path in self._files] + self._chunks
+        chunks.append(self._buffer[:self._used])
+        return np.concatenate(chunks)
+
+    def paths(self) -> List[List[tuple]]:
+        """Trayectoria completa (lista de coordenadas) de cada agente registrado."""
+        rows = self.to_array()
+        if not len(rows):
+            return []
+        rows = rows[np.lexsort((rows["step"], rows["agent"]))]
+        _, starts = np.unique(rows["agent"], return_index=True)
+        return [list(zip(group["x"].tolist(), group["y"].tolist())) for group in np.split(rows, starts[1:])]
@@ -0,0 +1,105 @@
+'''
+Ruteo por lotes: agrupa consultas por origen y reparte los grupos en un pool de procesos.
+'''
+from __future__ import annotations
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import graph_tool as gt
+import graph_tool.topology
+import numpy as np
+
+from zorzim.space.parallel import can_fork, fork_map, shared
+
+def routes_from_tree(
+    distances: np.ndarray, predecessors: np.ndarray, source: int, targets: Sequence[int]
+) -> List[np.ndarray]:
+    """Rutas desde `source` a cada destino, siguiendo un árbol de predecesores."""
+    routes = []
+    for target in targets:
+        target = int(target)
+        if not np.isfinite(distances[target]):
+            routes.append(np.empty(0, dtype=np.int32))
+            continue
+        path = [target]
+        while path[-1] != source:
+            previous = int(predecessors[path[-1]])
+            if previous == path[-1] or len(path) > len(predecessors):
+                path = []
+                break
+            path.append(previous)
+        routes.append(np.array(path[::-1], dtype=np.int32))
+    return routes
+
+
+def one_to_many(
+    graph: gt.Graph, weights: gt.EdgePropertyMap, source: int, targets: Sequence[int]
+) -> List[np.ndarray]:
+    """Una sola búsqueda de Dijkstra desde `source`, detenida al alcanzar todos los destinos."""
+    source = int(source)
+    targets = [int(target) for target in targets]
+    # Con `target` graph-tool sólo devuelve las distancias a los destinos, así que el
+    # mapa completo se entrega explícitamente para poder leerlo después
+    dist_map = graph.new_vertex_property("double")
+    _, pred_map = gt.topology.shortest_distance(
+        graph,
+        source=graph.vertex(source),
+        target=[graph.vertex(target) for target in set(targets)],
+        weights=weights,
+        dist_map=dist_map,
+        pred_map=True,
+    )
+    return routes_from_tree(dist_map.a, pred_map.a, source, targets)
+
+
+def _route_group(group: Tuple[int, List[int]]) -> List[np.ndarray]:
+    graph, weights = shared()
+    source, targets = group
+    return one_to_many(graph, weights, source, targets)
+
+
+def batch_routes(
+    graph: gt.Graph,
+    weights: gt.EdgePropertyMap,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    processes: Optional[int] = None,
+    parallel_threshold: int = 64,
+) -> List[np.ndarray]:
+    """
+    Rutas (arreglos de ids de vértice) para cada par `sources[i]` -> `targets[i]`.
+
+    Las consultas se agrupan por origen y cada grupo se resuelve con una búsqueda
+    uno-a-muchos. Si hay al menos `parallel_threshold` grupos y el sistema permite
+    `fork`, los grupos se reparten en un pool de `processes` procesos que comparten el
+    grafo de sólo lectura por copy-on-write.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if sources.shape != targets.shape:
+        raise ValueError("sources y targets deben tener el mismo largo.")
+    if len(sources) == 0:
+        return []
+
+    order = np.argsort(sources, kind="stable")
+    group_sources, starts = np.unique(sources[order], return_index=True)
+    group_indices = np.split(order, starts[1:])
+    groups = [(int(source), targets[indices].tolist()) for source, indices in zip(group_sources, group_indices)]
+
+    processes = processes or os.cpu_count() or 1
+    use_pool = (
+        processes > 1
+        and len(groups) >= parallel_threshold
+        and can_fork()
+    )
+    if use_pool:
+        chunksize = max(1, len(groups) // (processes * 4))
+        group_routes = fork_map(_route_group, groups, (graph, weights), processes, chunksize=chunksize)
+    else:
+        group_routes = [one_to_many(graph, weights, source, group_targets) for source, group_targets in groups]
+
+    routes: List[np.ndarray] = [None] * len(sources)
+    for indices, group_result in zip(group_indices, group_routes):
+        for index, route in zip(indices.tolist(), group_result):
+            routes[index] = route
+    return routes
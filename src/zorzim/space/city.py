@@ -1,10 +1,18 @@
 from collections import defaultdict
-from typing import Dict, DefaultDict, Set
+from typing import Dict, DefaultDict, Iterable, List, Optional, Set
 
 import math
 import mesa
 import mesa_geo as mg
-from shapely.geometry import Point
+import numpy as np
+import pyproj
+import shapely
+
+from zorzim.space.grid_index import GridIndex
+
+# Lado por omisión de las celdas del índice de commuters (~500 m)
+DEFAULT_CELL_SIZE_DEGREES = 0.005
+DEFAULT_CELL_SIZE_METERS = 500.0
 
 def get_distance(pos_1: mesa.space.FloatCoordinate, pos_2: mesa.space.FloatCoordinate) -> float:
     x1, y1 = pos_1
@@ -18,11 +26,18 @@ def get_distance(pos_1: mesa.space.FloatCoordinate, pos_2: mesa.space.FloatCoord
 class City(mg.GeoSpace):
     _commuters_pos_map: DefaultDict[mesa.space.FloatCoordinate, Set["Commuter"]]
     _commuter_id_map: Dict[int, "Commuter"]
+    _commuter_index: GridIndex
+    _pending_moves: Dict[int, "Commuter"]
 
-    def __init__(self, crs: str) -> None:
+    def __init__(self, crs: str, index_cell_size: Optional[float] = None) -> None:
         super().__init__(crs=crs)
         self._commuters_pos_map = defaultdict(set)
         self._commuter_id_map = dict()
+        if index_cell_size is None:
+            geographic = pyproj.CRS.from_user_input(crs).is_geographic
+            index_cell_size = DEFAULT_CELL_SIZE_DEGREES if geographic else DEFAULT_CELL_SIZE_METERS
+        self._commuter_index = GridIndex(index_cell_size)
+        self._pending_moves = dict()
         self.road_graph = None  # Inicializa como None
 
     def set_road_graph(self, graph):
@@ -39,29 +54,83 @@ class City(mg.GeoSpace):
         from zorzim.agent.commuter import Commuter  # Importación diferida
         return self._commuter_id_map[commuter_id]
 
+    def get_commuters_within(
+        self, center: mesa.space.FloatCoordinate, radius: float
+    ) -> List["Commuter"]:
+        """Commuters a distancia `radius` (en unidades del CRS) de `center`, según sus posiciones actuales."""
+        return [self._commuter_id_map[i] for i in self._commuter_index.query_radius(center, radius)]
+
+    def get_commuters_in_ring(
+        self, center: mesa.space.FloatCoordinate, inner: float, outer: float
+    ) -> List["Commuter"]:
+        """Commuters a distancia mayor que `inner` y hasta `outer` de `center` (el anillo entre ambos radios)."""
+        return [self._commuter_id_map[i] for i in self._commuter_index.query_ring(center, inner, outer)]
+
+    def get_commuters_in_bbox(
+        self, min_x: float, min_y: float, max_x: float, max_y: float
+    ) -> List["Commuter"]:
+        """Commuters cuya posición actual está dentro de la caja."""
+        return [self._commuter_id_map[i] for i in self._commuter_index.query_bbox(min_x, min_y, max_x, max_y)]
+
     def add_commuter(self, agent: "Commuter") -> None:
         from zorzim.agent.commuter import Commuter  # Importación diferida
         super().add_agents([agent])
         self._commuters_pos_map[(agent.geometry.x, agent.geometry.y)].add(agent)
         self._commuter_id_map[agent.unique_id] = agent
+        self._commuter_index.insert(agent.unique_id, (agent.geometry.x, agent.geometry.y))
 
     def move_commuter(self, commuter: "Commuter", pos: mesa.space.FloatCoordinate) -> None:
+        """
+        Mueve al commuter actualizando en el lugar el mapa de posiciones y el índice de
+        grilla. La geometría del agente y el índice espacial de mesa-geo se actualizan
+        recién en `flush_moves`, una vez por paso.
+        """
         if pos is None or not isinstance(pos, tuple) or len(pos) != 2:
             raise ValueError(
                 f"Error: No se puede mover al commuter {commuter.unique_id} porque la posición es inválida: {pos}. "
                 f"Posición previa: {commuter.geometry}."
             )
-        self.__remove_commuter(commuter)
-        commuter.geometry = Point(pos)
-        self.add_commuter(commuter)
+        previous = self._commuter_index.position(commuter.unique_id)
+        if previous == pos:
+            return
+        self._commuters_pos_map[previous].discard(commuter)
+        self._commuters_pos_map[pos].add(commuter)
+        self._commuter_index.move(commuter.unique_id, pos)
+        self._pending_moves[commuter.unique_id] = commuter
+
+    def move_commuters(self, commuters: Iterable["Commuter"], positions: np.ndarray) -> None:
+        """Versión por lotes de `move_commuter`; `positions` es un arreglo (N, 2)."""
+        for commuter, (x, y) in zip(commuters, positions.tolist()):
+            self.move_commuter(commuter, (x, y))
+
+    def flush_moves(self) -> int:
+        """
+        Aplica los movimientos pendientes: crea las geometrías nuevas en un solo llamado
+        vectorizado y reconstruye una sola vez el índice espacial de la capa de agentes.
+        Devuelve el número de commuters movidos.
+        """
+        if not self._pending_moves:
+            return 0
+        moved = list(self._pending_moves.values())
+        self._pending_moves.clear()
+        coords = np.array([self._commuter_index.position(commuter.unique_id) for commuter in moved])
+        for commuter, geometry in zip(moved, shapely.points(coords)):
+            commuter.geometry = geometry
+        # mesa-geo reconstruye su R-tree completo en cada alta o baja; aquí se hace una vez.
+        # `_recreate_rtree` es privado de mesa-geo 0.7.1 (la versión fijada en environment.yml)
+        if not hasattr(self._agent_layer, "_recreate_rtree"):
+            raise RuntimeError("flush_moves requiere mesa-geo 0.7.1 (falta `_AgentLayer._recreate_rtree`).")
+        self._agent_layer._recreate_rtree()
+        return len(moved)
 
-    def __remove_commuter(self, commuter: "Commuter") -> None:
+    def remove_commuter(self, commuter: "Commuter") -> None:
         from zorzim.agent.commuter import Commuter  # Importación diferida
         super().remove_agent(commuter)
         del self._commuter_id_map[commuter.unique_id]
-        self._commuters_pos_map[(commuter.geometry.x, commuter.geometry.y)].remove(
-            commuter
-        )
+        self._pending_moves.pop(commuter.unique_id, None)
+        pos = self._commuter_index.position(commuter.unique_id)
+        self._commuter_index.remove(commuter.unique_id)
+        self._commuters_pos_map[pos].remove(commuter)
 
     def add_agent(self, agent: "mg.GeoAgent") -> None:
         """Añade un agente a la ciudad."""
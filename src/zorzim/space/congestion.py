@@ -0,0 +1,98 @@
+'''
+Congestión por arista: ocupación, capacidad y velocidad según la densidad.
+'''
+from __future__ import annotations
+
+import geopandas as gpd
+import graph_tool as gt
+import numpy as np
+import pandas as pd
+
+# Pistas supuestas cuando la calle no tiene la etiqueta `lanes` de OSM
+DEFAULT_LANES = {
+    "motorway": 3,
+    "trunk": 2,
+    "primary": 2,
+    "secondary": 2,
+    "tertiary": 1,
+    "unclassified": 1,
+    "residential": 1,
+    "living_street": 1,
+    "service": 1,
+    "pedestrian": 2,
+    "footway": 1,
+    "path": 1,
+    "steps": 0.5,  # Escaleras de Valparaíso: la mitad de una pista
+}
+
+# Agentes que caben por metro de pista antes de que la velocidad empiece a caer
+AGENTS_PER_LANE_METER = 0.5
+
+
+def road_lanes(roads: gpd.GeoDataFrame) -> np.ndarray:
+    """
+    Pistas de cada calle de `roads` (la capa de `get_network` de pyrosm): la etiqueta
+    `lanes` si existe (en valores como "2;3" se usa el primero), o el valor por omisión
+    de su tipo de `highway`.
+    """
+    if "highway" in roads:
+        highway = roads["highway"].astype(str).str.replace("_link", "", regex=False)
+        lanes = highway.map(DEFAULT_LANES).fillna(1).to_numpy(dtype=np.float64)
+    else:
+        lanes = np.ones(len(roads))
+    if "lanes" in roads:
+        tagged = pd.to_numeric(roads["lanes"].astype(str).str.split(";").str[0], errors="coerce").to_numpy()
+        lanes = np.where(tagged > 0, tagged, lanes)
+    return lanes
+
+
+class CongestionModel:
+    """
+    Modelo de congestión con arreglos por arista (indexados por índice de arista).
+
+    `update` cuenta en una sola pasada vectorizada cuántos agentes hay en cada arista y
+    recalcula el factor de velocidad con la función BPR:
+    `factor = 1 / (1 + alpha * (ocupación / capacidad) ** beta)`, de modo que una arista
+    con el doble de agentes que su capacidad reduce la velocidad a ~30% (alpha=0.15, beta=4).
+    """
+    capacity: np.ndarray
+    occupancy: np.ndarray
+    speed_factor: np.ndarray
+
+    def __init__(self, capacity: np.ndarray, alpha: float = 0.15, beta: float = 4.0) -> None:
+        self.capacity = np.maximum(np.asarray(capacity, dtype=np.float64), 1.0)
+        self.alpha = alpha
+        self.beta = beta
+        self.occupancy = np.zeros(len(self.capacity), dtype=np.int64)
+        self.speed_factor = np.ones(len(self.capacity))
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: gt.Graph,
+        edge_weights: gt.EdgePropertyMap,
+        units_per_meter: float,
+        agents_per_lane_meter: float = AGENTS_PER_LANE_METER,
+        **kwargs,
+    ) -> "CongestionModel":
+        """
+        Capacidad de cada arista según su largo en metros y sus pistas (la propiedad
+        "lanes" del grafo, que debe existir).
+        """
+        if "lanes" not in graph.ep:
+            raise ValueError("El grafo no tiene la propiedad 'lanes'; reconstruya la red (o su caché).")
+        lengths = np.asarray(edge_weights.a, dtype=np.float64) / units_per_meter
+        lanes = graph.ep["lanes"].a
+        return cls(lengths * lanes * agents_per_lane_meter, **kwargs)
+
+    def update(self, edges: np.ndarray) -> None:
+        """Recalcula ocupación y velocidades a partir de la arista actual de cada agente (-1 si ninguna)."""
+        edges = np.asarray(edges, dtype=np.int64)
+        self.occupancy = np.bincount(edges[edges >= 0], minlength=len(self.capacity))
+        ratio = self.occupancy / self.capacity
+        np.divide(1.0, 1.0 + self.alpha * ratio ** self.beta, out=self.speed_factor)
+
+    def factors(self, edges: np.ndarray, default: float = 1.0) -> np.ndarray:
+        """Factor de velocidad de cada arista de `edges` (`default` donde la arista es -1)."""
+        edges = np.asarray(edges, dtype=np.int64)
+        return np.where(edges >= 0, self.speed_factor[np.maximum(edges, 0)], default)
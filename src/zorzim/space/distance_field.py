@@ -0,0 +1,74 @@
+'''
+Campos de distancia con múltiples orígenes sobre la red vial.
+'''
+from __future__ import annotations
+from typing import Sequence
+
+import graph_tool as gt
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# scipy descarta las aristas de peso cero, así que se reemplazan por un peso mínimo
+MIN_WEIGHT = 1e-12
+
+
+class EdgeMatrix:
+    """
+    Matriz de adyacencia dispersa (CSR) del grafo, con un peso por par de vértices (el
+    menor entre aristas paralelas). `set_weights` actualiza los pesos en el lugar, sin
+    reconstruir la estructura, cuando cambian los pesos de las aristas.
+    """
+    directed: bool
+    matrix: csr_matrix
+
+    def __init__(self, graph: gt.Graph, weights: np.ndarray) -> None:
+        edges = graph.get_edges([graph.edge_index])
+        n = graph.num_vertices()
+        self.directed = graph.is_directed()
+        sources, targets, ids = edges[:, 0], edges[:, 1], edges[:, 2]
+        if not self.directed:
+            # Cada arista no dirigida se guarda una vez, con el menor id de vértice primero
+            sources, targets = np.minimum(sources, targets), np.maximum(sources, targets)
+        keys = sources * n + targets
+        order = np.argsort(keys, kind="stable")
+        self._edge_ids = ids[order]
+        unique_keys, self._group_starts = np.unique(keys[order], return_index=True)
+        self.matrix = csr_matrix(
+            (np.ones(len(unique_keys)), (unique_keys // n, unique_keys % n)), shape=(n, n)
+        )
+        # `csr_matrix` ordena por fila y columna, igual que `unique_keys`
+        self.set_weights(weights)
+
+    def set_weights(self, weights: np.ndarray) -> None:
+        """Pesos indexados por id de arista (por ejemplo `edge_weights.a`)."""
+        grouped = np.minimum.reduceat(np.asarray(weights, dtype=np.float64)[self._edge_ids], self._group_starts)
+        self.matrix.data[:] = np.maximum(grouped, MIN_WEIGHT)
+
+    def distances(self, sources: Sequence[int], return_predecessors: bool = False, reverse: bool = False):
+        """
+        Distancia de cada vértice al origen más cercano de `sources`, y el índice (en
+        `sources`) de ese origen; -1 para los vértices inalcanzables. El segundo arreglo
+        es la partición de Voronoi de la red.
+
+        Con `return_predecessors=True` devuelve además el bosque de caminos más cortos:
+        siguiendo los predecesores desde un vértice se llega a su origen más cercano. Con
+        `reverse=True` las distancias se miden desde cada vértice hacia los orígenes (sólo
+        cambia algo en grafos dirigidos).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        n = self.matrix.shape[0]
+        if not len(sources):
+            empty = (np.full(n, np.inf), np.full(n, -1, dtype=np.int64))
+            return empty + (np.full(n, -9999, dtype=np.int32),) if return_predecessors else empty
+        matrix = self.matrix.T.tocsr() if reverse and self.directed else self.matrix
+        distances, predecessors, nearest = dijkstra(
+            matrix, directed=self.directed, indices=sources, return_predecessors=True, min_only=True
+        )
+        # `dijkstra` devuelve el vértice de origen; se traduce a su posición en `sources`
+        source_rows = np.full(n, -1, dtype=np.int64)
+        source_rows[sources[::-1]] = np.arange(len(sources))[::-1]
+        nearest = np.where(nearest >= 0, source_rows[np.maximum(nearest, 0)], -1)
+        if return_predecessors:
+            return distances, nearest, predecessors
+        return distances, nearest
@@ -0,0 +1,126 @@
+'''
+Propagación del fuego por la red vial y agentes afectados por el cierre de aristas.
+'''
+from __future__ import annotations
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Sequence
+
+import numpy as np
+
+from zorzim.space.distance_field import EdgeMatrix
+
+
+class FireFront:
+    """
+    Frente de fuego que avanza por la red vial a velocidad constante.
+
+    El tiempo de llegada del fuego a cada vértice se obtiene de una sola búsqueda de
+    Dijkstra con múltiples orígenes (los focos), en vez de recalcular una zona en cada
+    paso. Los vértices se guardan ordenados por tiempo de llegada, así que `advance`
+    devuelve los vértices que se quemaron desde la llamada anterior en O(k).
+    Los tiempos están en minutos y `speed` en unidades del CRS por minuto.
+    """
+    speed: float
+    arrival: np.ndarray
+    burned: np.ndarray
+
+    def __init__(self, matrix: EdgeMatrix, speed: float) -> None:
+        if speed <= 0:
+            raise ValueError("La velocidad de propagación del fuego debe ser positiva.")
+        self._matrix = matrix
+        self.speed = speed
+        n = matrix.matrix.shape[0]
+        self.arrival = np.full(n, np.inf)
+        self.burned = np.zeros(n, dtype=bool)
+        self._order = np.empty(0, dtype=np.int64)
+        self._order_times = np.empty(0)
+        self._cursor = 0
+
+    def ignite(self, vertices: Sequence[int], time: float) -> None:
+        """Agrega focos en `vertices` que empiezan a arder en el minuto `time`."""
+        distances, _ = self._matrix.distances(vertices)
+        np.minimum(self.arrival, time + distances / self.speed, out=self.arrival)
+        pending = np.flatnonzero(~self.burned & np.isfinite(self.arrival))
+        self._order = pending[np.argsort(self.arrival[pending], kind="stable")]
+        self._order_times = self.arrival[self._order]
+        self._cursor = 0
+
+    def advance(self, time: float) -> np.ndarray:
+        """Vértices alcanzados por el fuego hasta el minuto `time` que aún no estaban quemados."""
+        end = self._cursor + int(np.searchsorted(self._order_times[self._cursor:], time, side="right"))
+        reached = self._order[self._cursor:end]
+        self._cursor = end
+        self.burned[reached] = True
+        return reached
+
+    @property
+    def next_arrival(self) -> float:
+        """Minuto en que el fuego alcanza el próximo vértice (infinito si ya no avanza)."""
+        return float(self._order_times[self._cursor]) if not self.done else np.inf
+
+    @property
+    def done(self) -> bool:
+        """True si el fuego ya alcanzó todos los vértices a los que puede llegar."""
+        return self._cursor == len(self._order)
+
+
+class EdgeAgentIndex:
+    """
+    Índice invertido arista → agentes cuya ruta la recorre.
+
+    Cuando se cierran aristas, `agents_crossing` revisa sólo a los agentes registrados en
+    ellas, y de cada uno sólo el tramo de ruta que le queda por recorrer (desde
+    `step_in_path`), en vez de recorrer a toda la población.
+    """
+    _agents: DefaultDict[int, Dict]  # Diccionarios como conjuntos ordenados (reproducibles)
+    _edges: Dict
+
+    def __init__(self) -> None:
+        self._agents = defaultdict(dict)
+        self._edges = {}
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def register(self, agent, edge_ids: np.ndarray) -> None:
+        """Asocia la ruta actual de `agent` (ids de arista, en orden) reemplazando la anterior."""
+        self.unregister(agent)
+        edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        self._edges[agent] = edge_ids
+        for edge in np.unique(edge_ids[edge_ids >= 0]).tolist():
+            self._agents[edge][agent] = None
+
+    def unregister(self, agent) -> None:
+        edge_ids = self._edges.pop(agent, None)
+        if edge_ids is None:
+            return
+        for edge in np.unique(edge_ids[edge_ids >= 0]).tolist():
+            agents = self._agents[edge]
+            agents.pop(agent, None)
+            if not agents:
+                del self._agents[edge]
+
+    def path_edges(self, agent) -> np.ndarray:
+        return self._edges.get(agent, np.empty(0, dtype=np.int64))
+
+    def agents_crossing(self, closed_edges: np.ndarray) -> List:
+        """
+        Agentes en viaje cuya ruta pendiente cruza alguna de `closed_edges`. Los agentes
+        que ya llegaron a su destino se eliminan del índice.
+        """
+        candidates = {}
+        for edge in np.asarray(closed_edges).tolist():
+            candidates.update(self._agents.get(edge, {}))
+        if not candidates:
+            return []
+
+        closed = np.asarray(closed_edges, dtype=np.int64)
+        affected = []
+        for agent in candidates:
+            if agent.has_reached_destination or not agent.traveling:
+                self.unregister(agent)
+                continue
+            remaining = self._edges[agent][agent.step_in_path:]
+            if np.isin(remaining, closed).any():
+                affected.append(agent)
+        return affected
@@ -0,0 +1,127 @@
+'''
+Índice espacial de grilla uniforme para posiciones que cambian en cada paso.
+'''
+from __future__ import annotations
+import math
+from collections import defaultdict
+from typing import DefaultDict, Dict, Hashable, List, Set, Tuple
+
+import mesa
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    """
+    Grilla uniforme de celdas de lado `cell_size` (en unidades del CRS) que asocia cada
+    clave a su posición. Insertar, mover y quitar cuestan O(1), y una consulta por radio o
+    por caja revisa sólo las celdas que la cubren, sin reconstruir nada.
+    """
+    cell_size: float
+    _cells: DefaultDict[Cell, Set[Hashable]]
+    _positions: Dict[Hashable, Tuple[float, float, Cell]]
+
+    def __init__(self, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError("cell_size debe ser positivo.")
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)
+        self._positions = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def position(self, key: Hashable) -> mesa.space.FloatCoordinate:
+        x, y, _ = self._positions[key]
+        return (x, y)
+
+    def insert(self, key: Hashable, pos: mesa.space.FloatCoordinate) -> None:
+        """Agrega `key` en `pos`, o la mueve si ya estaba en el índice."""
+        x, y = float(pos[0]), float(pos[1])
+        cell = self._cell(x, y)
+        previous = self._positions.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard_from_cell(key, previous[2])
+        self._cells[cell].add(key)
+        self._positions[key] = (x, y, cell)
+
+    move = insert
+
+    def remove(self, key: Hashable) -> None:
+        _, _, cell = self._positions.pop(key)
+        self._discard_from_cell(key, cell)
+
+    def _discard_from_cell(self, key: Hashable, cell: Cell) -> None:
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+
+    def query_bbox(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[Hashable]:
+        """Claves cuya posición está dentro de la caja (bordes incluidos)."""
+        min_cx, min_cy = self._cell(min_x, min_y)
+        max_cx, max_cy = self._cell(max_x, max_y)
+        found = []
+        for cell in self._cells_between(min_cx, min_cy, max_cx, max_cy):
+            for key in self._cells[cell]:
+                x, y, _ = self._positions[key]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    found.append(key)
+        return found
+
+    def query_radius(self, center: mesa.space.FloatCoordinate, radius: float) -> List[Hashable]:
+        """Claves a distancia euclidiana menor o igual a `radius` de `center`."""
+        cx, cy = center
+        min_cx, min_cy = self._cell(cx - radius, cy - radius)
+        max_cx, max_cy = self._cell(cx + radius, cy + radius)
+        radius_sq = radius * radius
+        found = []
+        for cell in self._cells_between(min_cx, min_cy, max_cx, max_cy):
+            for key in self._cells[cell]:
+                x, y, _ = self._positions[key]
+                if (x - cx) ** 2 + (y - cy) ** 2 <= radius_sq:
+                    found.append(key)
+        return found
+
+    def query_ring(self, center: mesa.space.FloatCoordinate, inner: float, outer: float) -> List[Hashable]:
+        """
+        Claves a distancia mayor que `inner` y menor o igual a `outer` de `center`. Las
+        celdas que quedan completamente dentro del círculo interior no se revisan.
+        """
+        cx, cy = center
+        min_cx, min_cy = self._cell(cx - outer, cy - outer)
+        max_cx, max_cy = self._cell(cx + outer, cy + outer)
+        inner_sq, outer_sq = inner * inner, outer * outer
+        size = self.cell_size
+        found = []
+        for cell in self._cells_between(min_cx, min_cy, max_cx, max_cy):
+            # Distancia a la esquina de la celda más lejana al centro
+            far_x = max(abs(cell[0] * size - cx), abs((cell[0] + 1) * size - cx))
+            far_y = max(abs(cell[1] * size - cy), abs((cell[1] + 1) * size - cy))
+            if far_x * far_x + far_y * far_y <= inner_sq:
+                continue
+            for key in self._cells[cell]:
+                x, y, _ = self._positions[key]
+                if inner_sq < (x - cx) ** 2 + (y - cy) ** 2 <= outer_sq:
+                    found.append(key)
+        return found
+
+    def _cells_between(self, min_cx: int, min_cy: int, max_cx: int, max_cy: int) -> List[Cell]:
+        # Si la caja cubre más celdas de las que hay ocupadas, basta con recorrer las ocupadas
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self._cells):
+            return [
+                cell for cell in self._cells
+                if min_cx <= cell[0] <= max_cx and min_cy <= cell[1] <= max_cy
+            ]
+        return [
+            (i, j)
+            for i in range(min_cx, max_cx + 1)
+            for j in range(min_cy, max_cy + 1)
+            if (i, j) in self._cells
+        ]
@@ -0,0 +1,114 @@
+'''
+Zonas de peligro sobre la red vial y su efecto en el ruteo.
+'''
+from __future__ import annotations
+from typing import Optional, Tuple
+
+import graph_tool as gt
+import mesa
+import numpy as np
+
+from zorzim.space.road_graph import EdgeLookup
+from zorzim.space.vertices import VertexStore
+
+
+class HazardMask:
+    """
+    Máscara de vértices y aristas bloqueadas por el fuego sobre un único grafo compartido.
+
+    En vez de copiar el grafo para cada consulta, las rutas usan la propiedad `weights`,
+    que coincide con los pesos originales salvo en las aristas bloqueadas, a las que se
+    suma una penalización mayor que el largo total de la red. Así las rutas evitan la
+    zona siempre que exista una alternativa, y un agente que parte dentro de ella sale
+    cruzando la menor cantidad posible de aristas bloqueadas.
+
+    Los bloqueos vienen de dos fuentes: la zona circular alrededor del foco (`update`) y
+    los vértices alcanzados por el frente de fuego (`block_vertices`), que se acumulan y
+    sólo cierran las aristas nuevas.
+    """
+    graph: gt.Graph
+    weights: gt.EdgePropertyMap
+    edges: EdgeLookup
+    blocked_vertices: np.ndarray
+    blocked_edges: np.ndarray  # Indexado por índice de arista
+    version: int
+
+    def __init__(
+        self,
+        graph: gt.Graph,
+        edge_weights: gt.EdgePropertyMap,
+        vertices: VertexStore,
+        edges: Optional[EdgeLookup] = None,
+    ) -> None:
+        self.graph = graph
+        self._vertices = vertices
+        self.edges = edges if edges is not None else EdgeLookup(graph, edge_weights)
+        self._base_weights = np.array(edge_weights.a, dtype=np.float64)
+        self._penalty = float(self._base_weights.sum()) + 1.0
+        self.weights = graph.new_edge_property("double", vals=self._base_weights)
+
+        edges = graph.get_edges([graph.edge_index])
+        self._edge_source = edges[:, 0]
+        self._edge_target = edges[:, 1]
+        self._edge_index = edges[:, 2]
+
+        self.blocked_vertices = np.zeros(graph.num_vertices(), dtype=bool)
+        self._zone_vertices = np.zeros(graph.num_vertices(), dtype=bool)
+        self._front_vertices = np.zeros(graph.num_vertices(), dtype=bool)
+        self.blocked_edges = np.zeros(len(self._base_weights), dtype=bool)
+        self._zone: Optional[Tuple[mesa.space.FloatCoordinate, float]] = None
+        self.version = 0
+
+    def update(self, center: Optional[mesa.space.FloatCoordinate], radius: float) -> bool:
+        """
+        Bloquea todos los vértices a distancia `radius` de `center` y las aristas que
+        los tocan. Devuelve True si la máscara cambió.
+        """
+        zone = (center, radius) if center is not None else None
+        if zone == self._zone:
+            return False
+        self._zone = zone
+
+        self._zone_vertices[:] = False
+        if center is not None:
+            self._zone_vertices[self._vertices.index.within(center, radius)] = True
+        np.logical_or(self._zone_vertices, self._front_vertices, out=self.blocked_vertices)
+        blocked_rows = self.blocked_vertices[self._edge_source] | self.blocked_vertices[self._edge_target]
+        self.blocked_edges[:] = False
+        self.blocked_edges[self._edge_index[blocked_rows]] = True
+
+        weights = self.weights.a
+        weights[:] = self._base_weights
+        weights[self.blocked_edges] += self._penalty
+        self.version += 1
+        return True
+
+    def block_vertices(self, vertices) -> np.ndarray:
+        """
+        Bloquea `vertices` (alcanzados por el frente de fuego) y las aristas que los tocan,
+        sin recalcular el resto de la máscara. Devuelve los índices de las aristas que
+        quedaron bloqueadas en esta llamada.
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        vertices = vertices[~self._front_vertices[vertices]]
+        if not len(vertices):
+            return np.empty(0, dtype=np.int64)
+        self._front_vertices[vertices] = True
+        self.blocked_vertices[vertices] = True
+
+        closed = np.unique(self.edges.incident_edges(vertices))
+        closed = closed[~self.blocked_edges[closed]]
+        if len(closed):
+            self.blocked_edges[closed] = True
+            self.weights.a[closed] += self._penalty
+        self.version += 1
+        return closed
+
+    def clear(self) -> bool:
+        """Elimina todos los bloqueos, incluidos los del frente de fuego."""
+        self._front_vertices[:] = False
+        self._zone = ()  # Fuerza el recálculo aunque no haya zona
+        return self.update(None, 0.0)
+
+    def is_blocked(self, vertex) -> bool:
+        return bool(self.blocked_vertices[int(vertex)])
@@ -0,0 +1,132 @@
+'''
+Caché en disco de las redes compiladas a partir de un archivo PBF.
+
+Cada red se guarda como un grafo binario de graph-tool más sus arreglos de coordenadas
+y su índice espacial, bajo `outputs/networks`. La llave combina la versión del formato,
+una huella del PBF, el tipo de red y los CRS, de modo que un arranque en caliente no
+necesita usar pyrosm.
+'''
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+import graph_tool as gt
+import numpy as np
+from pyrosm import OSM
+
+from zorzim.space.vertices import VertexIndex
+
+CACHE_PATH = Path(__file__).parent.parent.parent.parent / "outputs" / "networks"
+
+# Versión del formato de las entradas. Se incrementa cuando cambia lo que se guarda (por
+# ejemplo, al agregar la propiedad "lanes" al grafo), para que las cachés antiguas no se usen
+CACHE_VERSION = 2
+
+
+@lru_cache(maxsize=None)
+def _hash_file(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as pbf:
+        for chunk in iter(lambda: pbf.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pbf_fingerprint(path: str, cache_dir: Path = CACHE_PATH) -> str:
+    """
+    Huella del contenido de un archivo PBF. Se memoriza por (ruta, tamaño, fecha de
+    modificación) en memoria y en disco, para no volver a leer el archivo completo.
+    """
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    index_path = cache_dir / "fingerprints.json"
+    try:
+        with open(index_path, "r") as index_file:
+            known = json.load(index_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        known = {}
+
+    if key not in known:
+        known[key] = _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(index_path, lambda f: json.dump(known, f), mode="w")
+    return known[key]
+
+
+def _atomic_write(path: Path, write, mode: str = "wb") -> None:
+    """Escribe en un archivo temporal y lo renombra, para no dejar entradas a medias."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, mode) as tmp_file:
+        write(tmp_file)
+    os.replace(tmp, path)
+
+
+class NetworkCache:
+    """
+    Caché de redes compiladas para un archivo PBF y un par de CRS dados.
+    `NetworkCache.enabled = False` desactiva la caché en todo el proceso.
+    """
+    enabled: bool = True
+    cache_dir: Path
+    fingerprint: str
+
+    def __init__(self, pbf_path: str, data_crs: str, model_crs: str, cache_dir: Path = CACHE_PATH) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.fingerprint = pbf_fingerprint(pbf_path, self.cache_dir)
+        self._crs_key = f"{str(data_crs).lower()}>{str(model_crs).lower()}"
+
+    @classmethod
+    def from_osm(cls, osm_object: OSM, data_crs: str, model_crs: str) -> Optional["NetworkCache"]:
+        """Caché asociada al archivo de `osm_object`, o None si está desactivada."""
+        pbf_path = getattr(osm_object, "filepath", None)
+        if not cls.enabled or pbf_path is None or not os.path.isfile(pbf_path):
+            return None
+        return cls(pbf_path, data_crs, model_crs)
+
+    def key(self, layer: str) -> str:
+        raw = f"v{CACHE_VERSION}|{self.fingerprint}|{layer}|{self._crs_key}"
+        return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+    def path(self, layer: str, suffix: str) -> Path:
+        """Ruta del archivo de la caché para `layer` con la extensión `suffix`."""
+        return self.cache_dir / f"{layer}-{self.key(layer)}{suffix}"
+
+    def load_graph(self, layer: str) -> Optional[Tuple[gt.Graph, np.ndarray, VertexIndex]]:
+        """Grafo, coordenadas (N, 2) e índice espacial guardados para `layer`, si existen."""
+        graph_path = self.path(layer, ".gt")
+        coords_path = self.path(layer, ".npz")
+        index_path = self.path(layer, ".kdtree.pkl")
+        if not (graph_path.is_file() and coords_path.is_file() and index_path.is_file()):
+            return None
+
+        graph = gt.load_graph(str(graph_path), fmt="gt")
+        with np.load(coords_path) as arrays:
+            coords = np.column_stack((arrays["x"], arrays["y"]))
+        with open(index_path, "rb") as index_file:
+            index = pickle.load(index_file)
+        return graph, coords, index
+
+    def save_graph(self, layer: str, graph: gt.Graph, coords: np.ndarray, index: VertexIndex) -> None:
+        """Guarda el grafo (con sus propiedades internas), sus coordenadas y su índice."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        _atomic_write(self.path(layer, ".npz"), lambda f: np.savez(f, x=coords[:, 0], y=coords[:, 1]))
+        _atomic_write(self.path(layer, ".kdtree.pkl"), lambda f: pickle.dump(index, f))
+        # El grafo se escribe al final: su presencia indica una entrada completa
+        _atomic_write(self.path(layer, ".gt"), lambda f: graph.save(f, fmt="gt"))
+
+    def load_array(self, layer: str) -> Optional[np.ndarray]:
+        """Arreglo de coordenadas guardado para `layer` (por ejemplo, edificios), si existe."""
+        path = self.path(layer, ".npy")
+        if not path.is_file():
+            return None
+        return np.load(path)
+
+    def save_array(self, layer: str, array: np.ndarray) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self.path(layer, ".npy"), lambda f: np.save(f, np.asarray(array)))
@@ -0,0 +1,77 @@
+'''
+Capa de extracción de OSM compartida entre las redes viales y los modelos de demanda.
+'''
+from __future__ import annotations
+from typing import Dict, Optional, Tuple, Union
+
+import geopandas as gpd
+from pyrosm import OSM
+
+from zorzim.space.road_network import CyclingNetwork, DrivingNetwork, RoadNetwork, WalkingNetwork
+
+NETWORK_CLASSES = {
+    "cycling": CyclingNetwork,
+    "driving": DrivingNetwork,
+    "walking": WalkingNetwork,
+}
+
+
+class OSMExtract:
+    """
+    Envoltorio de un objeto `OSM` que extrae cada capa (redes "all", "walking",
+    "cycling", "driving" y edificios) una sola vez y la comparte entre todos sus
+    consumidores. Expone la misma interfaz `get_network` / `get_buildings` que `OSM`,
+    por lo que puede pasarse en su lugar, y además memoriza las instancias de
+    `RoadNetwork` para que el modelo y el modelo de partición modal usen las mismas.
+    """
+    osm: OSM
+    _layers: Dict[Tuple[str, bool], Union[gpd.GeoDataFrame, Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]]]
+    _networks: Dict[Tuple[str, Optional[str], str, str], RoadNetwork]
+
+    def __init__(self, osm_object: OSM) -> None:
+        self.osm = osm_object
+        self._layers = {}
+        self._networks = {}
+
+    @classmethod
+    def wrap(cls, osm_object: Union[OSM, "OSMExtract"]) -> "OSMExtract":
+        """Devuelve `osm_object` si ya es un `OSMExtract`, o lo envuelve en uno nuevo."""
+        if isinstance(osm_object, cls):
+            return osm_object
+        return cls(osm_object)
+
+    @property
+    def filepath(self) -> Optional[str]:
+        return getattr(self.osm, "filepath", None)
+
+    def get_network(self, network_type: str = "walking", nodes: bool = False):
+        """Igual que `OSM.get_network`, pero extrae cada tipo de red una sola vez."""
+        if (network_type, True) in self._layers:
+            layer = self._layers[(network_type, True)]
+            return layer if nodes else layer[1]
+        if not nodes and (network_type, False) in self._layers:
+            return self._layers[(network_type, False)]
+
+        layer = self.osm.get_network(network_type=network_type, nodes=nodes)
+        if nodes:
+            # La versión con nodos también sirve las consultas sin nodos
+            self._layers.pop((network_type, False), None)
+        self._layers[(network_type, nodes)] = layer
+        return layer
+
+    def get_buildings(self) -> gpd.GeoDataFrame:
+        if ("buildings", False) not in self._layers:
+            self._layers[("buildings", False)] = self.osm.get_buildings()
+        return self._layers[("buildings", False)]
+
+    def road_network(self, network_type: str, city: Optional[str], data_crs: str, model_crs: str) -> RoadNetwork:
+        """Instancia compartida de la red vial de tipo `network_type`."""
+        key = (network_type, city, str(data_crs), str(model_crs))
+        if key not in self._networks:
+            network_class = NETWORK_CLASSES[network_type]
+            self._networks[key] = network_class(city=city, data_crs=data_crs, model_crs=model_crs, osm_object=self)
+        return self._networks[key]
+
+    def clear_layers(self) -> None:
+        """Libera las capas crudas extraídas; las redes compiladas se conservan."""
+        self._layers.clear()
@@ -0,0 +1,51 @@
+'''
+Pools de procesos por fork que comparten datos de sólo lectura con los procesos hijos.
+'''
+from __future__ import annotations
+import multiprocessing
+from typing import Any, Callable, List, Sequence
+
+import graph_tool as gt
+
+# Datos compartidos con los procesos hijos (heredados por fork, sin copiarlos)
+_SHARED: Any = None
+
+
+def shared() -> Any:
+    """Datos entregados a `fork_map`, leídos desde un proceso hijo."""
+    return _SHARED
+
+
+def can_fork() -> bool:
+    """
+    True si se puede crear un pool por fork: el sistema lo permite y el proceso actual no
+    es un proceso hijo de otro pool (los procesos daemon no pueden tener hijos).
+    """
+    return "fork" in multiprocessing.get_all_start_methods() and not multiprocessing.current_process().daemon
+
+
+def init_worker() -> None:
+    # Evita que OpenMP se bloquee tras el fork y que los procesos compitan por núcleos
+    gt.openmp_set_num_threads(1)
+
+
+def fork_map(function: Callable, tasks: Sequence, shared_data: Any, processes: int, chunksize: int = 1) -> List:
+    """
+    `Pool.map` sobre un pool creado por fork, en el que `shared()` devuelve `shared_data`
+    en cada proceso hijo. Así los datos grandes (grafos, fábricas de modelos) se comparten
+    por copy-on-write en vez de serializarse con cada tarea.
+
+    Si no se puede crear el pool (ver `can_fork`), por ejemplo al llamarse desde un
+    proceso hijo de otro `fork_map`, las tareas se ejecutan en serie. Al terminar se
+    restauran los datos compartidos anteriores, que el proceso hijo puede seguir usando.
+    """
+    global _SHARED
+    previous, _SHARED = _SHARED, shared_data
+    try:
+        if not can_fork():
+            return [function(task) for task in tasks]
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes=processes, initializer=init_worker) as pool:
+            return pool.map(function, tasks, chunksize=chunksize)
+    finally:
+        _SHARED = previous
@@ -0,0 +1,112 @@
+'''
+Construcción vectorizada del grafo vial a partir de las geometrías de OSM.
+'''
+from __future__ import annotations
+from typing import Optional, Tuple
+
+import geopandas as gpd
+import graph_tool as gt
+import numpy as np
+import shapely
+
+from zorzim.space.vertices import VertexStore
+
+
+def segment_arrays(geometries: gpd.GeoSeries, return_index: bool = False):
+    """
+    Descompone las líneas de `geometries` en tramos entre coordenadas consecutivas.
+    Devuelve las coordenadas únicas (N, 2) y los ids de origen y destino de cada tramo;
+    con `return_index=True`, también la posición en `geometries` de la línea de cada tramo.
+    """
+    lines, geometry_ids = shapely.get_parts(np.asarray(geometries, dtype=object), return_index=True)
+    is_line = shapely.get_type_id(lines) == shapely.GeometryType.LINESTRING
+    lines, geometry_ids = lines[is_line], geometry_ids[is_line]
+    coords, line_ids = shapely.get_coordinates(lines, return_index=True)
+
+    # Un tramo une dos coordenadas consecutivas de la misma línea
+    same_line = line_ids[1:] == line_ids[:-1]
+
+    unique_coords, inverse = np.unique(coords, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sources = inverse[:-1][same_line]
+    targets = inverse[1:][same_line]
+    if return_index:
+        return unique_coords, sources, targets, geometry_ids[line_ids[:-1][same_line]]
+    return unique_coords, sources, targets
+
+
+def build_road_graph(
+    geometries: gpd.GeoSeries,
+    lanes: Optional[np.ndarray] = None,
+) -> Tuple[gt.Graph, gt.EdgePropertyMap, VertexStore]:
+    """
+    Construye un grafo no dirigido donde cada vértice es una coordenada única de la red
+    y cada arista un tramo entre coordenadas consecutivas, con su largo como peso.
+    Si se entrega `lanes` (pistas de cada geometría), cada arista hereda las de su calle
+    en la propiedad interna "lanes".
+    """
+    unique_coords, sources, targets, segment_rows = segment_arrays(geometries, return_index=True)
+    lengths = np.hypot(
+        unique_coords[targets, 0] - unique_coords[sources, 0],
+        unique_coords[targets, 1] - unique_coords[sources, 1],
+    )
+
+    G = gt.Graph(directed=False)
+    edge_weights = G.new_edge_property("double")
+    G.add_vertex(len(unique_coords))
+    G.add_edge_list(np.column_stack((sources, targets, lengths)), eprops=[edge_weights])
+    if lanes is not None:
+        G.ep["lanes"] = G.new_edge_property("double", vals=np.asarray(lanes, dtype=np.float64)[segment_rows])
+
+    return G, edge_weights, VertexStore(unique_coords[:, 0], unique_coords[:, 1])
+
+
+class EdgeLookup:
+    """
+    Búsqueda vectorizada de aristas del grafo: ids de las aristas que recorre una ruta
+    (dada como secuencia de vértices) y aristas incidentes a un conjunto de vértices.
+    Los ids son los índices de arista de graph-tool (`graph.edge_index`).
+    """
+    num_vertices: int
+    sources: np.ndarray
+    targets: np.ndarray
+    edge_ids: np.ndarray
+
+    def __init__(self, graph: gt.Graph, edge_weights: Optional[gt.EdgePropertyMap] = None) -> None:
+        edges = graph.get_edges([graph.edge_index])
+        self.num_vertices = n = graph.num_vertices()
+        self.sources, self.targets, self.edge_ids = edges[:, 0], edges[:, 1], edges[:, 2]
+        weights = edge_weights.a[self.edge_ids] if edge_weights is not None else np.zeros(len(edges))
+
+        sources, targets, ids, weights = self.sources, self.targets, self.edge_ids, weights
+        if not graph.is_directed():
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+            ids, weights = np.concatenate((ids, ids)), np.concatenate((weights, weights))
+        keys = sources * n + targets
+        # Entre aristas paralelas queda primero la más corta, que es la que usan las rutas
+        order = np.lexsort((weights, keys))
+        self._keys = keys[order]
+        self._key_ids = ids[order]
+
+        # Incidencia vértice -> aristas en formato CSR
+        vertices = np.concatenate((self.sources, self.targets))
+        order = np.argsort(vertices, kind="stable")
+        self._incident = np.concatenate((self.edge_ids, self.edge_ids))[order]
+        self._incident_start = np.searchsorted(vertices[order], np.arange(n + 1))
+
+    def path_edges(self, path) -> np.ndarray:
+        """Ids de las aristas entre vértices consecutivos de `path` (-1 si no existe la arista)."""
+        path = np.asarray(path, dtype=np.int64)
+        if len(path) < 2:
+            return np.empty(0, dtype=np.int64)
+        keys = path[:-1] * self.num_vertices + path[1:]
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[positions] == keys, self._key_ids[positions], -1)
+
+    def incident_edges(self, vertices) -> np.ndarray:
+        """Ids de las aristas que tocan alguno de `vertices` (puede haber repetidos)."""
+        vertices = np.asarray(vertices, dtype=np.int64)
+        starts = self._incident_start[vertices]
+        counts = self._incident_start[vertices + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self._incident[offsets]
@@ -1,29 +1,45 @@
 from __future__ import annotations
-from cytoolz import keymap, valmap
 
-import pickle
-from typing import Dict, List, Tuple, Optional
+from typing import List, Optional
 from pathlib import Path
 
-import geopandas as gpd
 import pyproj
 import graph_tool as gt
 import mesa
 import numpy as np
 from pyrosm import OSM
-from sklearn.neighbors import KDTree
 from aves.models.network import Network
 
+from zorzim.space.network_cache import NetworkCache
+from zorzim.space.route_cache import RouteCache
+from zorzim.space.routing import DijkstraEngine, RoutingEngine
+from zorzim.space.vertices import VertexIndex
+
+
+CACHE_PATH = Path(__file__).parent.parent.parent.parent / "outputs"
+
 
 class RoadNetwork:
     _gt_graph: gt.Graph
-    _kd_tree: KDTree
+    _vertex_index: VertexIndex
+    route_cache: RouteCache
     _data_crs: pyproj.CRS
     _model_crs: pyproj.CRS
 
     def __init__(self, osm_object: OSM, data_crs: str , model_crs: str , network_type):
         self._data_crs = data_crs
         self._model_crs = model_crs
+        self.network_type = network_type
+        self.route_cache = RouteCache()
+        self._routing_engine = None
+
+        cache = NetworkCache.from_osm(osm_object, data_crs, model_crs)
+        # Las rutas persistidas sólo son válidas para la misma red compilada
+        self._network_key = cache.key(network_type) if cache is not None else None
+        cached = cache.load_graph(network_type) if cache is not None else None
+        if cached is not None:
+            self._gt_graph, _, self._vertex_index = cached
+            return
 
         nodes, edges = osm_object.get_network(nodes=True, network_type=network_type)
 
@@ -47,6 +63,10 @@ class RoadNetwork:
 
         self.gt_graph = network.network
 
+        if cache is not None:
+            coords = np.column_stack((self.gt_graph.vp["x"].a, self.gt_graph.vp["y"].a))
+            cache.save_graph(network_type, self.gt_graph, coords, self._vertex_index)
+
     @property
     def gt_graph(self) -> gt.Graph:
         return self._gt_graph
@@ -54,7 +74,13 @@ class RoadNetwork:
     @gt_graph.setter
     def gt_graph(self, gt_graph) -> None:
         self._gt_graph = gt_graph
-        self._kd_tree = KDTree(np.vstack((list(self.gt_graph.vp["x"]), list(self.gt_graph.vp["y"]))).T)
+        self._vertex_index = VertexIndex(np.column_stack((self.gt_graph.vp["x"].a, self.gt_graph.vp["y"].a)))
+
+    @property
+    def routing_engine(self) -> RoutingEngine:
+        if self._routing_engine is None:
+            self._routing_engine = DijkstraEngine(self.gt_graph, self.gt_graph.ep["edge_weight"])
+        return self._routing_engine
 
     @property
     def crs(self) -> pyproj.CRS:
@@ -72,13 +98,12 @@ class RoadNetwork:
     def pos_to_node(
             self, pos: mesa.space.FloatCoordinate
     ) -> gt.Vertex:
-        v_index = self._kd_tree.query([pos], k=1, return_distance=False)[0][0]
-        return self.gt_graph.vertex(v_index)
+        return self.gt_graph.vertex(self._vertex_index.nearest(pos))
 
     def get_nearest_node(
         self, float_pos: mesa.space.FloatCoordinate
     ) -> mesa.space.FloatCoordinate:
-        v_index = self._kd_tree.query([float_pos], k=1, return_distance=False)[0][0]
+        v_index = self._vertex_index.nearest(float_pos)
         return (self.gt_graph.vp["x"][v_index], self.gt_graph.vp["y"][v_index])
 
     def get_shortest_path(
@@ -86,108 +111,51 @@ class RoadNetwork:
     ) -> List[mesa.space.FloatCoordinate]:
         source_node = self.pos_to_node(source)
         target_node = self.pos_to_node(target)
-        shortest_path = gt.topology.shortest_path(
-            self.gt_graph, source_node, target_node, self._gt_graph.ep["edge_weight"])
-        path = list(map(self.node_to_pos, shortest_path[0]))
-        return path
+        route = self.route_cache.get(source_node, target_node)
+        if route is None:
+            route = self.routing_engine.route(int(source_node), int(target_node))
+            self.route_cache.put(source_node, target_node, route)
+        return self.route_to_pos(route)
+
+    def _route_cache_file(self, city: str) -> Optional[Path]:
+        if self._network_key is None:
+            return None
+        return CACHE_PATH / f"{city}_{self.network_type}_{self._network_key}_routes.bin"
+
+    def route_to_pos(self, route) -> List[mesa.space.FloatCoordinate]:
+        """Convierte una ruta de ids de vértice en coordenadas."""
+        x = self.gt_graph.vp["x"].a[route]
+        y = self.gt_graph.vp["y"].a[route]
+        return list(zip(x.tolist(), y.tolist()))
+
+    def get_cached_path(
+        self, source: mesa.space.FloatCoordinate, target: mesa.space.FloatCoordinate
+    ) -> Optional[List[mesa.space.FloatCoordinate]]:
+        route = self.route_cache.get(self.pos_to_node(source), self.pos_to_node(target))
+        return None if route is None else self.route_to_pos(route)
 
 class CyclingNetwork(RoadNetwork):
     city: str
-    _path_select_cache: Dict[
-        Tuple[mesa.space.FloatCoordinate, mesa.space.FloatCoordinate],
-        List[mesa.space.FloatCoordinate],
-    ]
 
     def __init__(self, city: str, data_crs: str, model_crs: str, osm_object: OSM) -> None:
         super().__init__(osm_object=osm_object, data_crs=data_crs , model_crs=model_crs, network_type="cycling")
         self.city = city
-        CACHE_PATH = Path(__file__).parent.parent.parent.parent / "outputs"
-        self._path_cache_result = CACHE_PATH / f"{city}_cycling_cache_result.pkl"
-        try:
-            with open(self._path_cache_result, "rb") as cached_result:
-                self._path_select_cache = pickle.load(cached_result)
-        except FileNotFoundError:
-            self._path_select_cache = dict()
-
-    def cache_path(
-        self,
-        source: mesa.space.FloatCoordinate,
-        target: mesa.space.FloatCoordinate,
-        path: List[mesa.space.FloatCoordinate],
-    ) -> None:
-        print(f"caching path... current number of cached paths: {len(self._path_select_cache)}")
-        self._path_select_cache[(source, target)] = path
-        # self._path_select_cache[(target, source)] = list(reversed(path))
-        with open(self._path_cache_result, "wb") as cached_result:
-            pickle.dump(self._path_select_cache, cached_result)
+        self.route_cache = RouteCache(self._route_cache_file(city))
 
 
 class DrivingNetwork(RoadNetwork):
     city: str
-    _path_select_cache: Dict[
-        Tuple[mesa.space.FloatCoordinate, mesa.space.FloatCoordinate],
-        List[mesa.space.FloatCoordinate],
-    ]
 
     def __init__(self, city: str, data_crs: str, model_crs: str, osm_object: OSM) -> None:
         super().__init__(osm_object=osm_object, data_crs=data_crs , model_crs=model_crs, network_type="driving")
         self.city = city
-        CACHE_PATH = Path(__file__).parent.parent.parent.parent / "outputs"
-        self._path_cache_result = CACHE_PATH / f"{city}_driving_cache_result.pkl"
-        try:
-            with open(self._path_cache_result, "rb") as cached_result:
-                self._path_select_cache = pickle.load(cached_result)
-        except FileNotFoundError:
-            self._path_select_cache = dict()
-
-    def cache_path(
-        self,
-        source: mesa.space.FloatCoordinate,
-        target: mesa.space.FloatCoordinate,
-        path: List[mesa.space.FloatCoordinate],
-    ) -> None:
-        print(f"caching path... current number of cached paths: {len(self._path_select_cache)}")
-        self._path_select_cache[(source, target)] = path
-        # self._path_select_cache[(target, source)] = list(reversed(path))
-        with open(self._path_cache_result, "wb") as cached_result:
-            pickle.dump(self._path_select_cache, cached_result)
+        self.route_cache = RouteCache(self._route_cache_file(city))
 
-    def get_cached_path(
-        self, source: mesa.space.FloatCoordinate, target: mesa.space.FloatCoordinate
-    ) -> Optional[List[mesa.space.FloatCoordinate]]:
-        return self._path_select_cache.get((source, target), None)
 
 class WalkingNetwork(RoadNetwork):
     city: str
-    _path_select_cache: Dict[
-        Tuple[mesa.space.FloatCoordinate, mesa.space.FloatCoordinate],
-        List[mesa.space.FloatCoordinate],
-    ]
 
     def __init__(self, city: str, data_crs: str, model_crs: str, osm_object: OSM) -> None:
         super().__init__(osm_object=osm_object, data_crs=data_crs , model_crs=model_crs, network_type="walking")
         self.city = city
-        CACHE_PATH = Path(__file__).parent.parent.parent.parent / "outputs"
-        self._path_cache_result = CACHE_PATH / f"{city}_walking_cache_result.pkl"
-        try:
-            with open(self._path_cache_result, "rb") as cached_result:
-                self._path_select_cache = pickle.load(cached_result)
-        except FileNotFoundError:
-            self._path_select_cache = dict()
-
-    def cache_path(
-        self,
-        source: mesa.space.FloatCoordinate,
-        target: mesa.space.FloatCoordinate,
-        path: List[mesa.space.FloatCoordinate],
-    ) -> None:
-        print(f"caching path... current number of cached paths: {len(self._path_select_cache)}")
-        self._path_select_cache[(source, target)] = path
-        self._path_select_cache[(target, source)] = list(reversed(path))
-        with open(self._path_cache_result, "wb") as cached_result:
-            pickle.dump(self._path_select_cache, cached_result)
-
-    def get_cached_path(
-        self, source: mesa.space.FloatCoordinate, target: mesa.space.FloatCoordinate
-    ) -> Optional[List[mesa.space.FloatCoordinate]]:
-        return self._path_select_cache.get((source, target), None)
\ No newline at end of file
+        self.route_cache = RouteCache(self._route_cache_file(city), symmetric=True)
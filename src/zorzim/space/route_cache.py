@@ -0,0 +1,166 @@
+'''
+Caché acotada de rutas indexada por vértices, con persistencia en un registro de solo anexado.
+'''
+from __future__ import annotations
+import atexit
+import os
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Costo aproximado en memoria de una entrada, además de los vértices de la ruta
+ENTRY_OVERHEAD_BYTES = 200
+
+# Cachés con registro en disco, que se vacían con un solo hook de `atexit`
+_PERSISTENT: "weakref.WeakSet[RouteCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for cache in list(_PERSISTENT):
+        cache.flush()
+
+
+class RouteCache:
+    """
+    Caché LRU de rutas indexada por (vértice origen, vértice destino).
+
+    Las rutas se guardan como arreglos int32 de ids de vértice. Cuando la memoria usada
+    supera `max_bytes` se descartan las entradas menos usadas. Si se entrega `path`, las
+    entradas nuevas se anexan en lotes de `flush_every` a un registro binario, que se
+    vuelve a leer al construir la caché y se compacta cuando crece demasiado.
+
+    Con `symmetric=True` (grafos no dirigidos) la ruta de `b` a `a` se obtiene invirtiendo
+    la ruta de `a` a `b`, y ambas comparten la misma entrada.
+
+    Sólo el proceso que creó la caché escribe el registro: los procesos hijos creados por
+    fork (réplicas, ruteo por lotes) la usan en memoria sin tocar el archivo.
+    """
+    max_bytes: int
+    flush_every: int
+    symmetric: bool
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_bytes: int = 64 * 2**20,
+        flush_every: int = 256,
+        symmetric: bool = False,
+    ) -> None:
+        self.path = Path(path) if path is not None else None
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.symmetric = symmetric
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._routes: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._pending: List[np.ndarray] = []
+        self._owner_pid = os.getpid()
+        if self.path is not None:
+            self._load()
+            _PERSISTENT.add(self)
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _key(self, source: int, target: int) -> Tuple[Tuple[int, int], bool]:
+        source, target = int(source), int(target)
+        if self.symmetric and target < source:
+            return (target, source), True
+        return (source, target), False
+
+    def get(self, source: int, target: int) -> Optional[np.ndarray]:
+        """Ruta guardada de `source` a `target`, o None si no está en la caché."""
+        key, reversed_key = self._key(source, target)
+        route = self._routes.get(key)
+        if route is None:
+            self.misses += 1
+            return None
+        self._routes.move_to_end(key)
+        self.hits += 1
+        return route[::-1] if reversed_key else route
+
+    def put(self, source: int, target: int, route) -> None:
+        """Guarda la ruta de `source` a `target` (secuencia de ids de vértice)."""
+        key, reversed_key = self._key(source, target)
+        route = np.asarray(route, dtype=np.int32)
+        if reversed_key:
+            route = route[::-1]
+        route = np.ascontiguousarray(route)
+        self._insert(key, route)
+        if self.path is not None and os.getpid() == self._owner_pid:
+            self._pending.append(np.concatenate((np.array([key[0], key[1], len(route)], dtype=np.int32), route)))
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def _insert(self, key: Tuple[int, int], route: np.ndarray) -> None:
+        previous = self._routes.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes + ENTRY_OVERHEAD_BYTES
+        self._routes[key] = route
+        self._bytes += route.nbytes + ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and len(self._routes) > 1:
+            _, evicted = self._routes.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Vacía la caché en memoria (por ejemplo, cuando cambian los pesos del grafo)."""
+        self._routes.clear()
+        self._pending.clear()
+        self._bytes = 0
+
+    def flush(self) -> None:
+        """Anexa las entradas pendientes al registro en disco."""
+        if self.path is None or not self._pending or os.getpid() != self._owner_pid:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as log:
+            np.concatenate(self._pending).tofile(log)
+        self._pending.clear()
+        if self.path.stat().st_size > 2 * self.max_bytes:
+            self._compact()
+
+    def _load(self) -> None:
+        try:
+            records = np.fromfile(self.path, dtype=np.int32)
+        except FileNotFoundError:
+            return
+        offset = 0
+        while offset + 3 <= len(records):
+            source, target, length = (int(value) for value in records[offset:offset + 3])
+            end = offset + 3 + length
+            if length < 0 or end > len(records):
+                break  # Registro truncado
+            self._insert((source, target), records[offset + 3:end].copy())
+            offset = end
+
+    def _compact(self) -> None:
+        """Reescribe el registro con sólo las entradas vigentes en memoria."""
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as log:
+            for (source, target), route in self._routes.items():
+                np.array([source, target, len(route)], dtype=np.int32).tofile(log)
+                route.tofile(log)
+        tmp.replace(self.path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._routes),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,37 @@
+'''
+Motores de ruteo intercambiables detrás de `RoadNetwork.get_shortest_path`.
+'''
+from __future__ import annotations
+import abc
+
+import graph_tool as gt
+import graph_tool.topology
+import numpy as np
+
+
+class RoutingEngine(abc.ABC):
+    '''
+    Clase base abstracta de los motores de ruteo. Una ruta es un arreglo de ids de vértice
+    desde `source` hasta `target`, o un arreglo vacío si `target` no es alcanzable.
+    '''
+    name: str
+
+    @abc.abstractmethod
+    def route(self, source: int, target: int) -> np.ndarray:
+        pass
+
+
+class DijkstraEngine(RoutingEngine):
+    '''
+    Búsqueda de Dijkstra de graph-tool, sin preprocesamiento.
+    '''
+    name = "dijkstra"
+
+    def __init__(self, graph: gt.Graph, weights: gt.EdgePropertyMap) -> None:
+        self.graph = graph
+        self.weights = weights
+
+    def route(self, source: int, target: int) -> np.ndarray:
+        vertices, _ = gt.topology.shortest_path(
+            self.graph, self.graph.vertex(source), self.graph.vertex(target), weights=self.weights)
+        return np.fromiter((int(v) for v in vertices), dtype=np.int64)
@@ -0,0 +1,129 @@
+'''
+Estructuras de ruteo hacia los centros de evacuación.
+'''
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Union
+
+import graph_tool as gt
+import mesa
+import numpy as np
+
+from zorzim.space.distance_field import EdgeMatrix
+from zorzim.space.hazard import HazardMask
+from zorzim.space.vertices import VertexStore
+
+
+class ShelterField:
+    """
+    Campo de distancias con múltiples orígenes desde todos los centros de evacuación.
+
+    Una sola búsqueda de Dijkstra desde todos los refugios a la vez entrega, para cada
+    vértice, la distancia al refugio más cercano por la red, cuál es ese refugio (la
+    partición de Voronoi de la red) y el bosque de caminos más cortos. Así, asignar el
+    refugio más cercano es una consulta O(1) y su ruta se obtiene siguiendo los
+    predecesores, sin una búsqueda por agente ni una por refugio.
+
+    Si los refugios tienen capacidad, los que se llenan dejan de ser orígenes y los
+    agentes siguientes reciben el refugio más cercano con cupo. El campo se recalcula
+    sólo cuando cambian la máscara de peligro, los refugios o los refugios con cupo.
+    """
+    graph: gt.Graph
+    hazard: HazardMask
+    shelters: List[mesa.space.FloatCoordinate]
+    shelter_vertices: np.ndarray
+    capacity: np.ndarray
+    load: np.ndarray
+    distances: np.ndarray  # Distancia de cada vértice a su refugio asignado
+    nearest: np.ndarray  # Refugio (fila) asignado a cada vértice, -1 si no alcanza ninguno
+    predecessors: np.ndarray
+
+    def __init__(self, graph: gt.Graph, hazard: HazardMask, vertices: VertexStore) -> None:
+        self.graph = graph
+        self.hazard = hazard
+        self._vertices = vertices
+        self._matrix = EdgeMatrix(graph, hazard.weights.a)
+        n = graph.num_vertices()
+        self._shelter_rows: Dict[mesa.space.FloatCoordinate, int] = {}
+        self.shelters = []
+        self.shelter_vertices = np.empty(0, dtype=np.int64)
+        self.capacity = np.empty(0)
+        self.load = np.empty(0, dtype=np.int64)
+        self.distances = np.full(n, np.inf)
+        self.nearest = np.full(n, -1, dtype=np.int64)
+        self.predecessors = np.full(n, -9999, dtype=np.int32)
+        self._built_key = None
+
+    def set_shelters(
+        self,
+        shelters: Iterable[mesa.space.FloatCoordinate],
+        capacity: Union[None, float, Iterable[float]] = None,
+    ) -> None:
+        """
+        Define los refugios y su capacidad (un valor para todos, uno por refugio, o None
+        para capacidad ilimitada). El campo se construye en la siguiente consulta.
+        """
+        self.shelters = [tuple(shelter) for shelter in shelters]
+        self._shelter_rows = {shelter: row for row, shelter in enumerate(self.shelters)}
+        self.shelter_vertices = np.asarray(self._vertices.index.nearest_many(self.shelters), dtype=np.int64)
+        if capacity is None:
+            capacity = np.inf
+        self.capacity = np.broadcast_to(np.asarray(capacity, dtype=np.float64), (len(self.shelters),)).copy()
+        self.load = np.zeros(len(self.shelters), dtype=np.int64)
+        self._built_key = None
+
+    def __contains__(self, shelter: mesa.space.FloatCoordinate) -> bool:
+        return shelter in self._shelter_rows
+
+    def __len__(self) -> int:
+        return len(self.shelters)
+
+    def _open_rows(self) -> np.ndarray:
+        """Refugios con cupo; si todos están llenos, todos (se ignora la capacidad)."""
+        rows = np.flatnonzero(self.load < self.capacity)
+        return rows if len(rows) else np.arange(len(self.shelters))
+
+    def _ensure_built(self) -> None:
+        open_rows = self._open_rows()
+        # Los refugios sólo se llenan, así que la cantidad con cupo identifica al conjunto
+        key = (self.hazard.version, len(open_rows))
+        if key == self._built_key:
+            return
+        self._matrix.set_weights(self.hazard.weights.a)
+        self.distances, nearest, self.predecessors = self._matrix.distances(
+            self.shelter_vertices[open_rows], return_predecessors=True, reverse=True
+        )
+        self.nearest = np.where(nearest >= 0, open_rows[np.maximum(nearest, 0)], -1)
+        self._built_key = key
+
+    def nearest_shelter(self, vertex) -> Optional[mesa.space.FloatCoordinate]:
+        """Refugio (con cupo) más cercano por la red a `vertex`, o None si no alcanza ninguno."""
+        self._ensure_built()
+        row = self.nearest[int(vertex)]
+        return self.shelters[row] if row >= 0 else None
+
+    def assign(self, vertex) -> Optional[mesa.space.FloatCoordinate]:
+        """Asigna a un agente en `vertex` su refugio más cercano con cupo y lo cuenta en su carga."""
+        shelter = self.nearest_shelter(vertex)
+        if shelter is not None:
+            self.load[self._shelter_rows[shelter]] += 1
+        return shelter
+
+    def distance(self, vertex) -> float:
+        """Distancia en la red desde `vertex` hasta su refugio más cercano."""
+        self._ensure_built()
+        return float(self.distances[int(vertex)])
+
+    def path(self, vertex) -> List[int]:
+        """Ruta (ids de vértice) desde `vertex` hasta su refugio más cercano, o [] si no es alcanzable."""
+        self._ensure_built()
+        vertex = int(vertex)
+        if self.nearest[vertex] < 0:
+            return []
+
+        path = [vertex]
+        while self.predecessors[vertex] >= 0:
+            vertex = int(self.predecessors[vertex])
+            path.append(vertex)
+            if len(path) > len(self.predecessors):
+                return []  # Bosque inconsistente
+        return path
@@ -1,10 +1,11 @@
+import math
 from typing import Tuple, List
 
 import geopandas as gpd
 import numpy as np
 import pyproj
 import mesa
-from shapely.geometry import LineString, MultiLineString, Point
+from shapely.geometry import LineString, MultiLineString
 from shapely.ops import transform
 from mesa.space import FloatCoordinate
 from zorzim.space.road_network import RoadNetwork
@@ -100,11 +101,28 @@ class UnitTransformer:
     def meter2degree(self, geom):
         return transform(self._meter2degree.transform, geom)
 
+    def degree2meter_xy(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Versión vectorizada de `degree2meter` para arreglos de coordenadas."""
+        return self._degree2meter.transform(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+
+    def meter2degree_xy(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Versión vectorizada de `meter2degree` para arreglos de coordenadas."""
+        return self._meter2degree.transform(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+
+
+def units_per_meter(crs) -> float:
+    """
+    Unidades de `crs` que equivalen a un metro: 1 en un CRS proyectado en metros, y la
+    aproximación de 1/111000 grados por metro en un CRS geográfico.
+    """
+    crs = pyproj.CRS.from_user_input(crs)
+    if crs.is_geographic:
+        return 1 / 111000
+    return 1 / crs.axis_info[0].unit_conversion_factor
+
 # Función que calcula la distancia entre dos puntos
 def get_distance(origin: FloatCoordinate, destination: FloatCoordinate) -> float:
-    point1 = Point(origin)
-    point2 = Point(destination)
-    return point1.distance(point2)
+    return math.hypot(destination[0] - origin[0], destination[1] - origin[1])
 
 class Mode(abc.ABC):
     '''
@@ -0,0 +1,113 @@
+'''
+Estructuras auxiliares sobre los vértices de la red vial del modelo.
+'''
+from __future__ import annotations
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import mesa
+import numpy as np
+from sklearn.neighbors import KDTree
+
+
+class VertexIndex:
+    """
+    Índice espacial (KD-tree) sobre las coordenadas de los vértices de un grafo.
+    La fila ``i`` de las coordenadas corresponde al vértice ``i`` del grafo, de modo
+    que las consultas devuelven directamente índices de vértice.
+    """
+    _kd_tree: KDTree
+
+    def __init__(self, coords: np.ndarray) -> None:
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0:
+            raise ValueError("No se puede construir un índice espacial sin vértices.")
+        self._kd_tree = KDTree(coords)
+
+    def nearest(self, pos: mesa.space.FloatCoordinate) -> int:
+        """Índice del vértice más cercano a `pos`."""
+        return int(self._kd_tree.query([pos], k=1, return_distance=False)[0][0])
+
+    def nearest_with_distance(self, pos: mesa.space.FloatCoordinate) -> Tuple[int, float]:
+        """Índice del vértice más cercano a `pos` y su distancia."""
+        distances, indices = self._kd_tree.query([pos], k=1)
+        return int(indices[0][0]), float(distances[0][0])
+
+    def nearest_many(self, positions: Iterable[mesa.space.FloatCoordinate], return_distance: bool = False):
+        """
+        Índices de los vértices más cercanos a cada posición, en una sola consulta. Con
+        `return_distance=True` devuelve también las distancias.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if len(positions) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, np.empty(0)) if return_distance else empty
+        if return_distance:
+            distances, indices = self._kd_tree.query(positions, k=1)
+            return indices[:, 0], distances[:, 0]
+        return self._kd_tree.query(positions, k=1, return_distance=False)[:, 0]
+
+    def within(self, pos: mesa.space.FloatCoordinate, radius: float) -> np.ndarray:
+        """Índices de los vértices a distancia menor o igual a `radius` de `pos`."""
+        return self._kd_tree.query_radius([pos], r=radius)[0]
+
+
+class VertexStore:
+    """
+    Almacén compacto de las coordenadas de los vértices de la red vial.
+    Las coordenadas viven en dos arreglos contiguos `x` e `y` indexados por id de
+    vértice, junto a un diccionario coordenada -> id para las búsquedas inversas.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    _coord_to_id: Dict[mesa.space.FloatCoordinate, int]
+    _index: Optional[VertexIndex]
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, index: Optional[VertexIndex] = None) -> None:
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        if self.x.shape != self.y.shape:
+            raise ValueError("Los arreglos de coordenadas x e y deben tener el mismo largo.")
+        self._coord_to_id = {coord: i for i, coord in enumerate(zip(self.x.tolist(), self.y.tolist()))}
+        self._index = index
+
+    @classmethod
+    def from_coords(cls, coords: Iterable[mesa.space.FloatCoordinate]) -> "VertexStore":
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return cls(coords[:, 0], coords[:, 1])
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __contains__(self, coord: mesa.space.FloatCoordinate) -> bool:
+        return coord in self._coord_to_id
+
+    @property
+    def coords(self) -> np.ndarray:
+        """Matriz (N, 2) con las coordenadas de todos los vértices."""
+        return np.column_stack((self.x, self.y))
+
+    @property
+    def index(self) -> VertexIndex:
+        """Índice espacial de los vértices, construido la primera vez que se usa."""
+        if self._index is None:
+            self._index = VertexIndex(self.coords)
+        return self._index
+
+    def coord(self, vertex) -> mesa.space.FloatCoordinate:
+        """Coordenadas del vértice `vertex` (id entero o `graph_tool.Vertex`)."""
+        vertex = int(vertex)
+        return (float(self.x[vertex]), float(self.y[vertex]))
+
+    def vertex_id(self, coord: mesa.space.FloatCoordinate) -> Optional[int]:
+        """Id del vértice ubicado exactamente en `coord`, o None si no existe."""
+        return self._coord_to_id.get(coord)
+
+    def random_vertex(self, rng: random.Random = random) -> int:
+        """Id de un vértice elegido al azar con `rng` (por omisión, el módulo `random`)."""
+        return rng.randrange(len(self))
+
+    def path_coords(self, path) -> List[mesa.space.FloatCoordinate]:
+        """Convierte una secuencia de vértices en una lista de coordenadas."""
+        ids = np.fromiter((int(v) for v in path), dtype=np.int64)
+        return list(zip(self.x[ids].tolist(), self.y[ids].tolist()))
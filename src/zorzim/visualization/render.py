@@ -0,0 +1,116 @@
+'''
+Etapa de renderizado opcional: gráfico final de rutas sobre un mapa base.
+
+matplotlib y contextily se importan recién al renderizar, de modo que las ejecuciones
+sin gráficos (modo batch, clúster sin red) no pagan su costo.
+'''
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+TILE_CACHE_PATH = Path("outputs/tiles")
+
+
+def plot_agent_paths_with_map(
+    paths: Sequence[Sequence[Tuple[float, float]]],
+    fire_focus: Optional[Tuple[float, float]],
+    evacuation_centers: Sequence[Tuple[float, float]],
+    output_file="agent_paths_with_map.png",
+    basemap: bool = True,
+    tile_cache: Optional[Path] = TILE_CACHE_PATH,
+    crs: str = "EPSG:4326",
+    dpi: int = 300,
+) -> None:
+    """
+    Crea un gráfico de las rutas recorridas por los agentes sobre un mapa base.
+
+    Con `basemap=True` las teselas de OpenStreetMap se leen de `tile_cache` (y se guardan
+    ahí la primera vez que se descargan). Si no hay red y las teselas no están en la
+    caché, el gráfico se genera sin mapa base.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # Se usa la API orientada a objetos (sin pyplot) para poder renderizar en otro hilo
+    fig = Figure(figsize=(10, 10))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # Dibujar las rutas de los agentes
+    for path in paths:
+        if len(path) > 1:
+            x_coords, y_coords = zip(*path)
+            ax.plot(x_coords, y_coords, linestyle="-", linewidth=1, alpha=0.7, color="blue")
+
+    # Dibujar el foco de incendio
+    if fire_focus:
+        fire_x, fire_y = fire_focus
+        ax.scatter(fire_x, fire_y, color="orange", s=100)
+
+    # Dibujar los centros de evacuación
+    for center in evacuation_centers:
+        center_x, center_y = center
+        ax.scatter(center_x, center_y, color="green", s=100)
+
+    # Agregar el fondo del mapa
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+    if basemap:
+        import contextily as ctx
+
+        if tile_cache is not None:
+            Path(tile_cache).mkdir(parents=True, exist_ok=True)
+            ctx.set_cache_dir(str(tile_cache))
+        try:
+            ctx.add_basemap(ax, crs=crs, source=ctx.providers.OpenStreetMap.Mapnik, zoom=15)
+        except Exception as e:
+            print(f"No se pudo agregar el mapa base (¿sin red y sin teselas en caché?): {e}")
+
+    # Configuración del gráfico
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    ax.axis("off")  # Eliminar ejes para una visualización más limpia
+    fig.savefig(output_file, bbox_inches="tight", dpi=dpi)
+
+
+class RenderStage:
+    """
+    Ejecuta los renderizados en un hilo de fondo para que la simulación no espere a
+    matplotlib ni a la descarga de teselas. `wait` bloquea hasta que terminen los
+    renderizados pendientes.
+    """
+
+    def __init__(self, basemap: bool = True, tile_cache: Optional[Path] = TILE_CACHE_PATH) -> None:
+        self.basemap = basemap
+        self.tile_cache = tile_cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: list = []
+
+    def submit(self, paths, fire_focus, evacuation_centers, output_file, crs: str = "EPSG:4326") -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zorzim-render")
+        future = self._executor.submit(
+            plot_agent_paths_with_map,
+            paths,
+            fire_focus,
+            list(evacuation_centers),
+            output_file,
+            basemap=self.basemap,
+            tile_cache=self.tile_cache,
+            crs=crs,
+        )
+        self._pending.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Espera los renderizados pendientes y propaga sus errores."""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self) -> None:
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,148 @@
+import random
+
+import mesa
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from zorzim.agent.commuter import Commuter
+from zorzim.model.agent_state import CommuterState
+
+NUM_COMMUTERS = 60
+NUM_STEPS = 40
+
+
+class FakeSpace:
+    """Registra la última posición entregada a `move_commuter` por cada agente."""
+
+    def __init__(self):
+        self.positions = {}
+
+    def move_commuter(self, commuter, pos):
+        self.positions[commuter.unique_id] = tuple(pos)
+
+    def move_commuters(self, commuters, positions):
+        for commuter, pos in zip(commuters, positions.tolist()):
+            self.move_commuter(commuter, tuple(pos))
+
+
+class FakeProfiler:
+    def count(self, name, amount=1):
+        pass
+
+
+class FakeModel(mesa.Model):
+    """Lo mínimo de `ZorZim` que usan `Commuter` y `CommuterState` sin rutear."""
+
+    def __init__(self, seed, continuous_movement):
+        super().__init__()
+        self.random = random.Random(seed)
+        self.time_per_step = 60
+        self.units_per_meter = 1.0
+        self.continuous_movement = continuous_movement
+        self.congestion = None
+        self.fire_focus = (0.0, 0.0)
+        self.fire_radius_value = 50.0
+        self.num_traveling = 0
+        self.got_to_destination = 0
+        self.space = FakeSpace()
+        self.profiler = FakeProfiler()
+
+    def register_path(self, agent, vertices):
+        pass
+
+    def start_evacuation(self, agents):
+        # Sin refugios, `_assign_evacuation_center` no rutea
+        for agent in agents:
+            agent.should_evacuate = True
+            agent._assign_evacuation_center()
+
+
+def build_model(seed, continuous_movement):
+    model = FakeModel(seed, continuous_movement)
+    rng = np.random.default_rng(seed)
+    commuters = []
+    for i in range(NUM_COMMUTERS):
+        start = tuple(rng.uniform(-100, 100, size=2).tolist())
+        commuter = Commuter(
+            unique_id=i,
+            model=model,
+            geometry=Point(start),
+            schedule=None,
+            crs="EPSG:32719",
+            speed=float(rng.uniform(0.5, 2.0)),
+            fire_focus=model.fire_focus,
+        )
+        if i % 2 == 0:
+            # Mitad de los agentes ya evacuando por una ruta al azar
+            steps = rng.normal(0, 15, size=(int(rng.integers(2, 12)), 2))
+            path = [start] + [tuple(p) for p in (np.array(start) + np.cumsum(steps, axis=0)).tolist()]
+            commuter.should_evacuate = True
+            commuter._set_traveling(True)
+            commuter.destination = path[-1]
+            commuter.my_path = path
+            commuter._reset_progress()
+        commuters.append(commuter)
+    return model, commuters
+
+
+def step_objects(model, commuters):
+    for commuter in commuters:
+        commuter.step()
+
+
+def step_columnar(model):
+    moved = model.agent_state.step(model)
+    model.space.move_commuters(
+        [model.agent_state.commuters[row] for row in moved],
+        np.column_stack((model.agent_state.x[moved], model.agent_state.y[moved])),
+    )
+
+
+def assert_same_state(objects_model, objects, columnar_model, columnar):
+    for expected, actual in zip(objects, columnar):
+        assert actual.pos == pytest.approx(expected.pos)
+        assert actual.step_in_path == expected.step_in_path
+        assert actual.has_reached_destination == expected.has_reached_destination
+        assert actual.should_evacuate == expected.should_evacuate
+        assert actual.traveling == expected.traveling
+        if expected.evacuation_time is None:
+            assert actual.evacuation_time is None
+        else:
+            assert actual.evacuation_time == pytest.approx(expected.evacuation_time)
+    assert columnar_model.got_to_destination == objects_model.got_to_destination
+    assert columnar_model.num_traveling == objects_model.num_traveling
+    # Las posiciones (incluidas las llegadas) pasan por el espacio en ambos motores
+    assert columnar_model.space.positions.keys() == objects_model.space.positions.keys()
+    for unique_id, pos in objects_model.space.positions.items():
+        assert columnar_model.space.positions[unique_id] == pytest.approx(pos)
+
+
+@pytest.mark.parametrize("continuous_movement", [False, True])
+def test_columnar_step_matches_object_step(continuous_movement):
+    objects_model, objects = build_model(3, continuous_movement)
+    columnar_model, columnar = build_model(3, continuous_movement)
+    columnar_model.agent_state = CommuterState.from_commuters(columnar)
+
+    for _ in range(NUM_STEPS):
+        step_objects(objects_model, objects)
+        step_columnar(columnar_model)
+        assert_same_state(objects_model, objects, columnar_model, columnar)
+    assert objects_model.got_to_destination == NUM_COMMUTERS // 2
+    assert any(commuter.should_evacuate for commuter in objects[1::2])
+
+
+def test_trail_can_be_disabled():
+    model, commuters = build_model(5, False)
+    state = CommuterState.from_commuters(commuters, trail_length=0)
+    state.step(model)
+    assert state.trail_x.size == 0
+    assert commuters[0].path_trail == []
+
+
+def test_trail_keeps_the_latest_positions():
+    model, commuters = build_model(5, False)
+    state = CommuterState.from_commuters(commuters, trail_length=3)
+    for _ in range(5):
+        state.step(model)
+    assert len(commuters[0].path_trail) == 3
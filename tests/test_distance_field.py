@@ -0,0 +1,88 @@
+import graph_tool as gt
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from zorzim.space.distance_field import EdgeMatrix
+
+
+def random_graph(seed, directed, n=60, m=200):
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, n, m)
+    targets = rng.integers(0, n, m)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    weights = rng.uniform(1.0, 10.0, len(sources))
+
+    graph = gt.Graph(directed=directed)
+    edge_weights = graph.new_edge_property("double")
+    graph.add_vertex(n)
+    graph.add_edge_list(np.column_stack((sources, targets, weights)), eprops=[edge_weights])
+    return graph, edge_weights, sources, targets, weights
+
+
+def reference_distances(n, sources, targets, weights, directed):
+    """Distancias entre todos los pares con scipy, tomando la menor entre aristas paralelas."""
+    dense = np.full((n, n), np.inf)
+    np.minimum.at(dense, (sources, targets), weights)
+    if not directed:
+        np.minimum.at(dense, (targets, sources), weights)
+    dense[np.isinf(dense)] = 0  # En una matriz dispersa, 0 es "sin arista"
+    return dijkstra(csr_matrix(dense), directed=True)
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_multi_source_distances_match_scipy(directed):
+    graph, edge_weights, sources, targets, weights = random_graph(4, directed)
+    n = graph.num_vertices()
+    reference = reference_distances(n, sources, targets, weights, directed)
+    matrix = EdgeMatrix(graph, edge_weights.a)
+
+    origins = [3, 17, 42]
+    distances, nearest = matrix.distances(origins)
+    np.testing.assert_allclose(distances, reference[origins].min(axis=0))
+    reachable = np.isfinite(distances)
+    assert np.all(nearest[~reachable] == -1)
+    # Cada vértice queda asignado a un origen a la distancia mínima (partición de Voronoi)
+    rows = np.flatnonzero(reachable)
+    np.testing.assert_allclose(reference[np.asarray(origins)[nearest[rows]], rows], distances[rows])
+
+
+@pytest.mark.parametrize("directed", [False, True])
+def test_predecessor_forest_follows_shortest_paths(directed):
+    graph, edge_weights, sources, targets, weights = random_graph(9, directed)
+    n = graph.num_vertices()
+    reference = reference_distances(n, sources, targets, weights, directed)
+    matrix = EdgeMatrix(graph, edge_weights.a)
+
+    origins = [0, 30]
+    distances, nearest, predecessors = matrix.distances(origins, return_predecessors=True, reverse=True)
+    # Con `reverse=True` las distancias van desde cada vértice hacia los orígenes
+    np.testing.assert_allclose(distances, reference[:, origins].min(axis=1))
+    for vertex in np.flatnonzero(np.isfinite(distances)):
+        total, current = 0.0, int(vertex)
+        while predecessors[current] >= 0:
+            following = int(predecessors[current])
+            total += reference[current, following] if reference[current, following] > 0 else 0.0
+            current = following
+        assert current == origins[nearest[vertex]]
+        assert total == pytest.approx(distances[vertex])
+
+
+def test_set_weights_updates_distances_in_place():
+    graph, edge_weights, sources, targets, weights = random_graph(2, False)
+    matrix = EdgeMatrix(graph, edge_weights.a)
+    doubled = 2 * np.asarray(edge_weights.a)
+    matrix.set_weights(doubled)
+
+    reference = reference_distances(graph.num_vertices(), sources, targets, 2 * weights, False)
+    distances, _ = matrix.distances([5])
+    np.testing.assert_allclose(distances, reference[5])
+
+
+def test_no_sources_leaves_every_vertex_unreachable():
+    graph, edge_weights, *_ = random_graph(1, False)
+    distances, nearest = EdgeMatrix(graph, edge_weights.a).distances([])
+    assert np.all(np.isinf(distances))
+    assert np.all(nearest == -1)
@@ -0,0 +1,62 @@
+import math
+import random
+
+import pytest
+
+from zorzim.space.grid_index import GridIndex
+
+
+def brute_force_ring(positions, center, inner, outer):
+    return {
+        key for key, (x, y) in positions.items()
+        if inner < math.hypot(x - center[0], y - center[1]) <= outer
+    }
+
+
+@pytest.fixture
+def scattered():
+    rng = random.Random(7)
+    positions = {i: (rng.uniform(-50, 50), rng.uniform(-50, 50)) for i in range(500)}
+    index = GridIndex(cell_size=7.5)
+    for key, pos in positions.items():
+        index.insert(key, pos)
+    return index, positions
+
+
+def test_query_radius_matches_brute_force(scattered):
+    index, positions = scattered
+    for center, radius in [((0, 0), 10), ((12.5, -3), 25), ((-49, 49), 5), ((0, 0), 200)]:
+        expected = brute_force_ring(positions, center, -1, radius)
+        assert set(index.query_radius(center, radius)) == expected
+
+
+def test_query_ring_matches_brute_force(scattered):
+    index, positions = scattered
+    for center, inner, outer in [((0, 0), 10, 20), ((5, 5), 0, 15), ((-20, 30), 30, 31), ((0, 0), 40, 200)]:
+        assert set(index.query_ring(center, inner, outer)) == brute_force_ring(positions, center, inner, outer)
+
+
+def test_ring_excludes_inner_boundary_and_includes_outer():
+    index = GridIndex(cell_size=1.0)
+    index.insert("inner", (3.0, 0.0))
+    index.insert("outer", (0.0, 5.0))
+    index.insert("center", (0.0, 0.0))
+    assert set(index.query_ring((0.0, 0.0), 3.0, 5.0)) == {"outer"}
+    assert set(index.query_radius((0.0, 0.0), 3.0)) == {"inner", "center"}
+
+
+def test_moves_and_removals_update_queries(scattered):
+    index, positions = scattered
+    rng = random.Random(11)
+    for key in rng.sample(sorted(positions), 100):
+        positions[key] = (rng.uniform(-50, 50), rng.uniform(-50, 50))
+        index.move(key, positions[key])
+    for key in rng.sample(sorted(positions), 50):
+        index.remove(key)
+        del positions[key]
+
+    assert len(index) == len(positions)
+    assert set(index.query_ring((3, -4), 8, 35)) == brute_force_ring(positions, (3, -4), 8, 35)
+    assert set(index.query_bbox(-10, -10, 10, 10)) == {
+        key for key, (x, y) in positions.items() if -10 <= x <= 10 and -10 <= y <= 10
+    }
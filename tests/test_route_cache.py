@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+
+from zorzim.space.route_cache import ENTRY_OVERHEAD_BYTES, RouteCache
+
+
+def test_log_round_trip(tmp_path):
+    path = tmp_path / "routes.bin"
+    cache = RouteCache(path, flush_every=2)
+    cache.put(1, 5, [1, 2, 3, 5])
+    cache.put(2, 7, [2, 7])
+    cache.put(3, 3, [3])
+    cache.flush()
+
+    reloaded = RouteCache(path)
+    assert len(reloaded) == 3
+    np.testing.assert_array_equal(reloaded.get(1, 5), [1, 2, 3, 5])
+    np.testing.assert_array_equal(reloaded.get(2, 7), [2, 7])
+    np.testing.assert_array_equal(reloaded.get(3, 3), [3])
+    assert reloaded.get(5, 1) is None
+
+
+def test_truncated_log_keeps_complete_records(tmp_path):
+    path = tmp_path / "routes.bin"
+    cache = RouteCache(path)
+    cache.put(1, 4, [1, 2, 4])
+    cache.put(2, 9, [2, 8, 9])
+    cache.flush()
+    records = np.fromfile(path, dtype=np.int32)
+    records[:-1].tofile(path)  # Se corta la última ruta
+
+    reloaded = RouteCache(path)
+    assert len(reloaded) == 1
+    np.testing.assert_array_equal(reloaded.get(1, 4), [1, 2, 4])
+
+
+def test_symmetric_routes_share_one_entry():
+    cache = RouteCache(symmetric=True)
+    cache.put(8, 3, [8, 5, 3])
+    assert len(cache) == 1
+    np.testing.assert_array_equal(cache.get(3, 8), [3, 5, 8])
+    np.testing.assert_array_equal(cache.get(8, 3), [8, 5, 3])
+
+
+def test_lru_eviction():
+    entry_bytes = 3 * 4 + ENTRY_OVERHEAD_BYTES  # Rutas de 3 vértices int32
+    cache = RouteCache(max_bytes=3 * entry_bytes)
+    for source in range(3):
+        cache.put(source, 10, [source, 5, 10])
+    cache.get(0, 10)  # La entrada 0 pasa a ser la más reciente
+    cache.put(3, 10, [3, 5, 10])
+
+    assert len(cache) == 3
+    assert cache.evictions == 1
+    assert cache.get(1, 10) is None
+    assert cache.get(0, 10) is not None
+    assert cache.get(3, 10) is not None
+    assert cache.nbytes == 3 * entry_bytes
+
+
+def test_compaction_keeps_only_live_entries(tmp_path):
+    path = tmp_path / "routes.bin"
+    entry_bytes = 3 * 4 + ENTRY_OVERHEAD_BYTES
+    cache = RouteCache(path, max_bytes=2 * entry_bytes, flush_every=1)
+    for source in range(100):
+        cache.put(source, 1000, [source, 500, 1000])
+
+    # Cada entrada ocupa 6 enteros en el registro: sin compactar serían 100 entradas
+    record_bytes = 6 * 4
+    assert path.stat().st_size <= 2 * cache.max_bytes + record_bytes
+    assert path.stat().st_size < 100 * record_bytes
+    assert not list(tmp_path.glob(".*.tmp"))
+
+    reloaded = RouteCache(path, max_bytes=cache.max_bytes)
+    assert len(reloaded) == 2
+    np.testing.assert_array_equal(reloaded.get(99, 1000), [99, 500, 1000])
+
+
+def test_clear_drops_pending_entries(tmp_path):
+    path = tmp_path / "routes.bin"
+    cache = RouteCache(path)
+    cache.put(1, 2, [1, 2])
+    cache.clear()
+    cache.flush()
+    assert len(cache) == 0
+    assert not path.exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requiere fork")
+def test_forked_process_does_not_write_the_log(tmp_path):
+    path = tmp_path / "routes.bin"
+    cache = RouteCache(path)
+    cache.put(1, 2, [1, 2])
+    cache.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        cache.put(3, 4, [3, 4])
+        cache.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    reloaded = RouteCache(path)
+    assert len(reloaded) == 1
+    assert reloaded.get(3, 4) is None
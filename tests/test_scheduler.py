@@ -0,0 +1,134 @@
+import math
+
+import mesa
+import pytest
+
+from zorzim.model.scheduler import EventScheduler
+
+MINUTES_PER_STEP = 5.0
+
+
+class FakeCommuter(mesa.Agent):
+    """Agente con la misma cuenta regresiva que `Commuter.step` y un viaje de `trip_steps` pasos."""
+
+    def __init__(self, unique_id, model, evacuation_time=None, evacuate_on_wake=False, trip_steps=2):
+        super().__init__(unique_id, model)
+        self.evacuation_time = evacuation_time
+        self.evacuate_on_wake = evacuate_on_wake
+        self.trip_steps = trip_steps
+        self.should_evacuate = False
+        self.has_reached_destination = False
+        self.traveling = False
+        self.my_path = []
+        self.activations = []
+
+    def step(self):
+        self.activations.append(self.model.schedule.steps)
+        if not self.should_evacuate:
+            if self.evacuation_time is not None:
+                self.evacuation_time -= MINUTES_PER_STEP
+                if self.evacuation_time <= 0:
+                    self.evacuation_time = None
+                    if self.evacuate_on_wake:
+                        self.should_evacuate = True
+                        self.traveling = True
+                        self.my_path = [(0.0, 0.0)] * (self.trip_steps + 1)
+        else:
+            self.trip_steps -= 1
+            if self.trip_steps <= 0:
+                self.traveling = False
+                self.has_reached_destination = True
+
+
+@pytest.fixture
+def model():
+    model = mesa.Model()
+    model.schedule = EventScheduler(model, MINUTES_PER_STEP)
+    return model
+
+
+def run(model, steps):
+    for _ in range(steps):
+        model.schedule.step()
+
+
+@pytest.mark.parametrize("evacuation_time", [1.0, 5.0, 12.0, 20.0])
+def test_sleeping_agents_wake_when_the_counter_runs_out(model, evacuation_time):
+    agent = FakeCommuter(1, model, evacuation_time)
+    model.schedule.add(agent)
+    run(model, 10)
+
+    assert agent.activations == [math.ceil(evacuation_time / MINUTES_PER_STEP)]
+    assert agent.evacuation_time is None
+
+
+def test_wake_leaves_the_counter_as_if_stepped_every_step(model):
+    agent = FakeCommuter(1, model, 12.0)
+    model.schedule.add(agent)
+    run(model, 2)
+    assert agent.activations == []
+    model.schedule.step()
+    # 12 - 3 * 5: la misma cuenta que si se hubiera activado en cada paso
+    assert agent.activations == [3]
+    assert agent.evacuation_time is None
+
+
+def test_idle_agents_are_never_activated(model):
+    idle = FakeCommuter(1, model)
+    model.schedule.add(idle)
+    run(model, 5)
+    assert idle.activations == []
+    assert model.schedule.next_event_step() is None
+
+
+def test_travelers_step_until_they_arrive(model):
+    agent = FakeCommuter(1, model, 5.0, evacuate_on_wake=True, trip_steps=3)
+    model.schedule.add(agent)
+    assert model.schedule.pending_evacuations == 0
+
+    model.schedule.step()
+    assert agent.should_evacuate
+    assert model.schedule.pending_evacuations == 1
+    assert model.schedule.num_travelers == 1
+
+    run(model, 5)
+    assert agent.activations == [1, 2, 3, 4]
+    assert agent.has_reached_destination
+    assert model.schedule.pending_evacuations == 0
+    assert model.schedule.num_travelers == 0
+
+
+def test_skip_to_jumps_over_idle_steps(model):
+    agent = FakeCommuter(1, model, 30.0)
+    model.schedule.add(agent)
+    assert model.schedule.next_event_step() == 6
+
+    model.schedule.skip_to(5)
+    assert model.schedule.steps == 5
+    with pytest.raises(ValueError):
+        model.schedule.skip_to(6)
+
+    model.schedule.step()
+    assert agent.activations == [6]
+    assert agent.evacuation_time is None
+
+
+def test_refresh_reschedules_from_the_current_step(model):
+    agent = FakeCommuter(1, model, 10.0)
+    model.schedule.add(agent)
+    run(model, 1)
+
+    # Se reinicia el contador con el mismo valor: debe contarse desde el paso actual
+    agent.evacuation_time = 10.0
+    model.schedule.refresh(agent)
+    run(model, 5)
+    assert agent.activations == [3]
+
+
+def test_removed_agents_are_not_woken(model):
+    agent = FakeCommuter(1, model, 5.0)
+    model.schedule.add(agent)
+    model.schedule.remove(agent)
+    run(model, 3)
+    assert agent.activations == []
+    assert model.schedule.next_event_step() is None
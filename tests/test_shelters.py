@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from shapely.geometry import LineString
+
+from zorzim.space.hazard import HazardMask
+from zorzim.space.road_graph import build_road_graph
+from zorzim.space.shelters import ShelterField
+
+# Calle recta de 6 vértices cada 10 unidades; los refugios quedan en los extremos
+STREET = [LineString([(10.0 * i, 0.0), (10.0 * (i + 1), 0.0)]) for i in range(5)]
+WEST, EAST = (0.0, 0.0), (50.0, 0.0)
+
+
+@pytest.fixture
+def street():
+    graph, edge_weights, vertices = build_road_graph(STREET)
+    hazard = HazardMask(graph, edge_weights, vertices)
+    return graph, hazard, vertices
+
+
+def vertex_at(vertices, x):
+    return vertices.vertex_id((x, 0.0))
+
+
+def test_nearest_shelter_distance_and_path(street):
+    graph, hazard, vertices = street
+    field = ShelterField(graph, hazard, vertices)
+    field.set_shelters([WEST, EAST])
+
+    origin = vertex_at(vertices, 10.0)
+    assert field.nearest_shelter(origin) == WEST
+    assert field.distance(origin) == pytest.approx(10.0)
+    assert vertices.path_coords(field.path(origin)) == [(10.0, 0.0), WEST]
+    assert field.nearest_shelter(vertex_at(vertices, 40.0)) == EAST
+
+
+def test_full_shelter_sends_agents_to_the_next_nearest(street):
+    graph, hazard, vertices = street
+    field = ShelterField(graph, hazard, vertices)
+    field.set_shelters([WEST, EAST], capacity=2)
+    origin = vertex_at(vertices, 10.0)
+
+    assert [field.assign(origin) for _ in range(3)] == [WEST, WEST, EAST]
+    np.testing.assert_array_equal(field.load, [2, 1])
+    # Con el refugio oeste lleno, la ruta y la distancia llevan al refugio este
+    assert field.distance(origin) == pytest.approx(40.0)
+    assert vertices.path_coords(field.path(origin)) == [(10.0 * i, 0.0) for i in range(1, 6)]
+
+
+def test_capacity_is_ignored_once_every_shelter_is_full(street):
+    graph, hazard, vertices = street
+    field = ShelterField(graph, hazard, vertices)
+    field.set_shelters([WEST, EAST], capacity=[1, 1])
+    origin = vertex_at(vertices, 10.0)
+
+    assert [field.assign(origin) for _ in range(4)] == [WEST, EAST, WEST, WEST]
+    np.testing.assert_array_equal(field.load, [3, 1])
+
+
+def test_hazard_changes_rebuild_the_field(street):
+    graph, hazard, vertices = street
+    field = ShelterField(graph, hazard, vertices)
+    field.set_shelters([WEST, EAST])
+    origin = vertex_at(vertices, 20.0)
+    assert field.nearest_shelter(origin) == WEST
+
+    # El fuego corta la calle entre el origen y el refugio oeste
+    hazard.update((10.0, 0.0), 1.0)
+    assert field.nearest_shelter(origin) == EAST
+    assert field.distance(origin) == pytest.approx(30.0)